@@ -0,0 +1,75 @@
+"""Compares received message representations: pydantic model
+(the previous implementation) versus the slotted `Message` record.
+
+    py -3 -m local.benchmarks.bench_message --messages 200000
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Dict, Optional
+from uuid import uuid4
+import tracemalloc
+
+from pydantic import BaseModel
+
+from sqs_gui.app.receiver import Message
+
+
+class PydanticMessage(BaseModel):
+    id: str
+    body: str
+    md5OfBody: str
+    attributes: Optional[Dict[str, dict]]
+    md5OfAttributes: Optional[str]
+    sysAttributes: Dict[str, str]
+    receiptHandle: str
+
+
+def make_fields(n: int):
+    return [
+        dict(
+            id=str(uuid4()),
+            body=f'{{"event": "created", "seq": {i}}}',
+            md5OfBody="0" * 32,
+            attributes=None,
+            md5OfAttributes=None,
+            sysAttributes={"SentTimestamp": str(1600000000000 + i)},
+            receiptHandle="h" * 180,
+        )
+        for i in range(n)
+    ]
+
+
+def bench(name: str, cls, fields):
+
+    start = perf_counter()
+    messages = [cls(**kwargs) for kwargs in fields]
+    elapsed = perf_counter() - start
+    del messages
+
+    tracemalloc.start()
+    messages = [cls(**kwargs) for kwargs in fields]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del messages
+
+    n = len(fields)
+    print(
+        f"{name:>9}: {elapsed / n * 1e6:.2f} us/message, "
+        f"{size / n:.0f} bytes/message allocated on construction"
+    )
+
+
+def main():
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    fields = make_fields(args.messages)
+    bench("pydantic", PydanticMessage, fields)
+    bench("slotted", Message, fields)
+
+
+if __name__ == "__main__":
+    main()
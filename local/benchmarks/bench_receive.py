@@ -0,0 +1,100 @@
+"""Compares receive engines against a local SQS stand-in.
+
+Start ElasticMQ first (see `local/docker-compose.yml`), then run
+from the repository root:
+
+    py -3 -m local.benchmarks.bench_receive --messages 20000
+"""
+
+from argparse import ArgumentParser
+from time import monotonic
+
+from sqs_gui.app.clients import Credentials, get_client
+from sqs_gui.app.receiver import (
+    PollingMode,
+    PollingOptions,
+    ReceiveConditions,
+    ReceiveEngine,
+    receiveMessages,
+)
+from sqs_gui.app.util import random_string
+
+
+def fill_queue(credentials: Credentials, queue_name: str, n: int) -> str:
+
+    client = get_client(credentials)
+    queue_url = client.create_queue(QueueName=queue_name)["QueueUrl"]
+
+    for start in range(0, n, 10):
+        entries = [
+            {"Id": str(i), "MessageBody": f"message-{i}-{random_string(10)}"}
+            for i in range(start, min(start + 10, n))
+        ]
+        client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+
+    return queue_url
+
+
+def bench_engine(
+    credentials: Credentials,
+    engine: ReceiveEngine,
+    num_messages: int,
+    num_workers: int,
+):
+
+    # Each run gets a fresh queue, because received
+    # messages stay invisible for `timeout` seconds
+    queue_name = f"bench-{engine.value}-{random_string(6)}"
+    queue_url = fill_queue(credentials, queue_name, num_messages)
+    conditions = ReceiveConditions(all=True, count=0, timeout=300)
+
+    # Queue is filled before receiving, so short polling drains it
+    # without a trailing empty long poll, which is not engine time
+    polling = PollingOptions(mode=PollingMode.short, empty_receives_tolerance=1)
+
+    try:
+        start = monotonic()
+        first_message_at = None
+        received = 0
+
+        for _ in receiveMessages(
+            queue_name,
+            credentials,
+            conditions,
+            num_workers=num_workers,
+            polling=polling,
+            engine=engine,
+        ):
+            if first_message_at is None:
+                first_message_at = monotonic() - start
+            received += 1
+
+        elapsed = monotonic() - start
+
+    finally:
+        get_client(credentials).delete_queue(QueueUrl=queue_url)
+
+    print(
+        f"{engine.value:>8}: {received} messages in {elapsed:.2f}s "
+        f"({received / elapsed:.0f} msg/s, "
+        f"first message after {first_message_at or 0:.3f}s)"
+    )
+
+
+def main():
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--endpoint", default="http://localhost:9324")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--coroutines", type=int, default=None)
+    args = parser.parse_args()
+
+    credentials = Credentials("x", "x", args.region, args.endpoint)
+    bench_engine(credentials, ReceiveEngine.threads, args.messages, args.threads)
+    bench_engine(credentials, ReceiveEngine.asyncio, args.messages, args.coroutines)
+
+
+if __name__ == "__main__":
+    main()
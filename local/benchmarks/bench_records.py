@@ -0,0 +1,83 @@
+"""Compares encode and decode throughput and size of stored messages:
+legacy JSON files (b85-encoded binary attributes) versus V2 records
+(binary fields, raw binary attributes).
+
+    py -3 -m local.benchmarks.bench_records --messages 100000
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+from uuid import uuid4
+import os
+
+from sqs_gui.app import records
+from sqs_gui.app.message import Message
+from sqs_gui.app.storage import MessageDiskStorage
+
+
+def make_messages(n: int, binary_size: int):
+    return [
+        Message(
+            id=str(uuid4()),
+            body=f'{{"event": "created", "seq": {i}}}',
+            md5OfBody="0" * 32,
+            attributes={
+                "trace": {"DataType": "String", "StringValue": str(uuid4())},
+                "payload": {
+                    "DataType": "Binary",
+                    "BinaryValue": os.urandom(binary_size),
+                },
+            },
+            md5OfAttributes="0" * 32,
+            sysAttributes={
+                "SentTimestamp": str(1600000000000 + i),
+                "ApproximateReceiveCount": "1",
+                "SenderId": "AIDAIENQZJOLO23YVJ4VO",
+            },
+            receiptHandle="h" * 180,
+        )
+        for i in range(n)
+    ]
+
+
+def encode_legacy(message: Message) -> bytes:
+    return MessageDiskStorage.serialize(message).encode()
+
+
+def decode_legacy(data: bytes) -> Message:
+    return MessageDiskStorage.deserialize(data.decode())
+
+
+def bench(name: str, encode, decode, messages):
+
+    start = perf_counter()
+    encoded = [encode(message) for message in messages]
+    encode_time = perf_counter() - start
+
+    start = perf_counter()
+    for record in encoded:
+        decode(record).attributes
+    decode_time = perf_counter() - start
+
+    n = len(messages)
+    size = sum(map(len, encoded))
+    print(
+        f"{name}: encode {n / encode_time:9.0f} msg/s, "
+        f"decode {n / decode_time:9.0f} msg/s, {size / n:.0f} bytes/record"
+    )
+
+
+def main():
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--binary-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.binary_size)
+    bench("JSON", encode_legacy, decode_legacy, messages)
+    bench("V2", records.encodeRecord, records.decodeRecord, messages)
+
+
+if __name__ == "__main__":
+    main()
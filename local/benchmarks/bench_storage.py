@@ -0,0 +1,99 @@
+"""Compares disk footprint, write and reload speed of message storage
+formats: plain segment records versus zlib/lzma compressed blocks.
+Reload is measured in this process and with a pool of worker processes.
+
+    py -3 -m local.benchmarks.bench_storage --messages 100000
+"""
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from uuid import uuid4
+import json
+import os
+
+from sqs_gui.app.receiver import Message
+from sqs_gui.app.storage import Compression, MessageDiskStorage
+
+
+def make_messages(n: int):
+    return [
+        Message(
+            id=str(uuid4()),
+            body=json.dumps(
+                {
+                    "event": "order.created",
+                    "seq": i,
+                    "customer": {"id": i % 1000, "country": "DE", "tier": "gold"},
+                    "items": [{"sku": f"SKU-{i % 97}", "qty": 1, "price": "9.99"}],
+                }
+            ),
+            md5OfBody="0" * 32,
+            attributes=None,
+            md5OfAttributes=None,
+            sysAttributes={"SentTimestamp": str(1600000000000 + i)},
+            receiptHandle="h" * 180,
+        )
+        for i in range(n)
+    ]
+
+
+def directory_size(path: str) -> int:
+
+    size = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(root, filename))
+
+    return size
+
+
+def bench(compression: Compression, messages):
+
+    with TemporaryDirectory() as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+
+        storage = MessageDiskStorage("bench-queue", compression=compression)
+        start = perf_counter()
+        storage.startReceivingJobs()
+        storage.saveMessages(messages)
+        storage.waitPendingJobsDone()
+        write_time = perf_counter() - start
+
+        size = directory_size(storage.getDataDir("bench-queue"))
+
+        start = perf_counter()
+        num_loaded = len(storage.loadMessages(numWorkers=1))
+        load_time = perf_counter() - start
+
+        start = perf_counter()
+        storage.loadMessages()
+        parallel_load_time = perf_counter() - start
+
+        start = perf_counter()
+        for _ in storage.iterSummaries():
+            pass
+        summaries_time = perf_counter() - start
+
+    assert num_loaded == len(messages)
+    print(
+        f"{compression.value:>5}: {size / 2**20:7.1f} MiB on disk, "
+        f"write {write_time:.2f} s, load {load_time:.2f} s, "
+        f"parallel load {parallel_load_time:.2f} s, "
+        f"summaries {summaries_time:.2f} s"
+    )
+
+
+def main():
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    for compression in Compression:
+        bench(compression, messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from logging.config import dictConfig
+from multiprocessing import freeze_support
 import yaml
 
 from sqs_gui.app import runApp
 
 if __name__ == "__main__":
 
+    # Storage workers are spawned as copies of frozen executable
+    freeze_support()
+
     # Configure logging
     with open("logging.yaml") as f:
         dictConfig(yaml.safe_load(f))
@@ -1 +1,7 @@
-from .app import runApp
\ No newline at end of file
+def runApp():
+
+    # GUI is imported on first use, so storage worker
+    # processes can import storage modules without it
+    from .app import runApp
+
+    runApp()
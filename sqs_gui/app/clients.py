@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional
+import os
+
+import boto3
+from botocore.config import Config
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mypy_boto3_sqs.client import SQSClient
+else:
+    SQSClient = object
+
+
+SERVICE_NAME = "sqs"
+
+
+@dataclass(frozen=True)
+class Credentials:
+    access_key: int
+    secret_key: int
+    region_name: str
+    endpoint_url: Optional[str]
+
+
+class SQSClientPool:
+
+    """Process-wide cache of SQS clients keyed by credentials.
+
+    Creating a boto3 session and client is expensive (service model
+    loading, credential resolution, TLS handshakes), and boto3 clients
+    are thread safe. So all receiver workers and queue operations share
+    one client per credentials, with HTTP connection pool sized for
+    the expected number of concurrent requests and TCP keep-alive.
+    """
+
+    _lock: Lock
+    _clients: Dict[Credentials, SQSClient]
+    _max_pool_connections: int
+
+    def __init__(self, max_pool_connections: Optional[int] = None):
+
+        if max_pool_connections is None:
+            max_pool_connections = max(10, 4 * (os.cpu_count() or 2))
+
+        if max_pool_connections <= 0:
+            raise ValueError("max_pool_connections must be greater than 0")
+
+        self._lock = Lock()
+        self._clients = dict()
+        self._max_pool_connections = max_pool_connections
+
+    @property
+    def max_pool_connections(self) -> int:
+        return self._max_pool_connections
+
+    def _create_client(self, credentials: Credentials) -> SQSClient:
+
+        config = Config(
+            max_pool_connections=self._max_pool_connections,
+            tcp_keepalive=True,
+            retries={"mode": "standard"},
+        )
+
+        return boto3.Session().client(
+            service_name=SERVICE_NAME,
+            region_name=credentials.region_name,
+            aws_access_key_id=credentials.access_key,
+            aws_secret_access_key=credentials.secret_key,
+            endpoint_url=credentials.endpoint_url,
+            config=config,
+        )
+
+    def get(self, credentials: Credentials) -> SQSClient:
+
+        with self._lock:
+
+            client = self._clients.get(credentials)
+            if client is None:
+                client = self._create_client(credentials)
+                self._clients[credentials] = client
+
+            return client
+
+    def clear(self):
+
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+_client_pool = SQSClientPool()
+
+
+def get_client(credentials: Credentials) -> SQSClient:
+    return _client_pool.get(credentials)
+
+
+def get_max_pool_connections() -> int:
+
+    """Returns size of HTTP connection pool of shared clients. More
+    concurrent requests would open connections that are not kept alive"""
+
+    return _client_pool.max_pool_connections
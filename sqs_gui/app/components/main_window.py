@@ -1,15 +1,17 @@
-from datetime import datetime
 from threading import Thread
+from time import time
 from typing import Dict, List
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from sqs_gui.app.components.message_tabs import MessageTabs
-from sqs_gui.app.components.messages_pane import MessageItem, MessagesPane
+from sqs_gui.app.components.messages_pane import MessagesPane
 from sqs_gui.app.components.hints_pane import HintsPane
 
 from sqs_gui.app.receiver import Credentials, ReceiveConditions, receiveMessages
-from sqs_gui.app.storage import MessageDiskStorage
+from sqs_gui.app.storage import Checkpoint, MessageDiskStorage, StorageLockedError
+from sqs_gui.app.scheduler import ReceiveScheduler
+from sqs_gui.app.storage_manager import StorageManager
 from .queues_pane import QueueItem, MessageQueuesPane
 from .properties_pane import MQPropertiesPane
 from ..queues import MessageQueue, QueueInfo, list_message_queues
@@ -35,6 +37,8 @@ HINT_TAB = "Hints"
 class CentralWidget(QWidget):
 
     _creds: Credentials
+    _scheduler: ReceiveScheduler
+    _storageManager: StorageManager
     _queues: List[MessageQueue]
     _messages: Dict[str, List[SQSMessage]]
 
@@ -45,12 +49,21 @@ class CentralWidget(QWidget):
     def __init__(self, creds: Credentials):
         super().__init__()
         self._creds = creds
+        self._scheduler = ReceiveScheduler()
+        self._storageManager = StorageManager()
+        self.enforceStorageLimits()
         self.getMessageQueueList()
         self.initUserInterface()
         self.setupSignalHandlers()
         self.applyStyleSheets()
         self.refreshQueuesPane()
 
+    def enforceStorageLimits(self):
+
+        # Queues with open tabs are not touched, storage
+        # manager checks them while it evicts data
+        Thread(target=self._storageManager.enforce, daemon=True).start()
+
     def getMessageQueueList(self):
         self._queues = list_message_queues(self._creds)
         self._messages = {q.name: list() for q in self._queues}
@@ -101,6 +114,8 @@ class CentralWidget(QWidget):
             # msg.exec()
             return
 
+        # Data shown in tab must stay on disk until tab is closed
+        self._storageManager.openQueue(queueInfo.name)
         messagesPane = MessagesPane(self)
         self._messageTabs.addTab(messagesPane, queueInfo.name)
         self._messageTabs.setCurrentWidget(messagesPane)
@@ -110,46 +125,65 @@ class CentralWidget(QWidget):
             messages = self._messages[queueInfo.name]
             conditions = ReceiveConditions(all=True, count=200, timeout=1)
 
-            storage = MessageDiskStorage(queueInfo.name)
-            loadedMessages = storage.loadMessages()
-            storage.startReceivingJobs()
-
-            for msg in loadedMessages:
-
-                sendTimestamp = msg.sysAttributes["SentTimestamp"]
-                sendDate = datetime.fromtimestamp(int(sendTimestamp) // 1000)
-
-                item = MessageItem(
-                    sendTimestamp=sendTimestamp,
-                    sendDate=sendDate.strftime("%c"),
-                    messageBody=msg.body[:256],
-                )
-
-                messagesPane.addItem(item)
-                messages.append(msg)
-
-            uids = set(map(lambda x: x.id, loadedMessages))
-            for msg in receiveMessages(
-                queueInfo.name,
-                self._creds,
-                conditions,
-                msg_ids_exclude=uids,
-            ):
-
-                sendTimestamp = msg.sysAttributes["SentTimestamp"]
-                sendDate = datetime.fromtimestamp(int(sendTimestamp) // 1000)
-
-                item = MessageItem(
-                    sendTimestamp=sendTimestamp,
-                    sendDate=sendDate.strftime("%c"),
-                    messageBody=msg.body[:256],
-                )
-
-                storage.saveMessage(msg)
-                messagesPane.addItem(item)
-                messages.append(msg)
-
-            storage.stopReceivingJobs()
+            self._storageManager.openQueue(queueInfo.name)
+            try:
+                storage = MessageDiskStorage(queueInfo.name)
+                messagesPane.setStorage(storage)
+                checkpoint = storage.loadCheckpoint()
+                rebuildIdIndex = checkpoint is None
+                if checkpoint is None:
+                    checkpoint = Checkpoint()
+
+                # Show dumped messages batch by batch. Only
+                # metadata is read, bodies stay on disk
+                storedIds: List[str] = []
+                for summaries in storage.iterSummaries():
+                    messagesPane.addMessages(summaries)
+                    if rebuildIdIndex:
+                        storedIds.extend(s.id for s in summaries)
+
+                # Index is built at once, merging it batch by batch is slower
+                if rebuildIdIndex:
+                    checkpoint.messageIds.update(storedIds)
+                    storedIds.clear()
+
+                # Queue dumped by another instance is shown read-only
+                try:
+                    storage.startReceivingJobs()
+                except StorageLockedError as e:
+                    print(f"Error - {e}")
+                    return
+
+                try:
+                    receiver = receiveMessages(
+                        queueInfo.name,
+                        self._creds,
+                        conditions,
+                        msg_ids_exclude=checkpoint.messageIds,
+                        scheduler=self._scheduler,
+                    )
+
+                    for batch in receiver.iter_batches():
+                        storage.saveMessages(batch)
+                        messagesPane.addMessages(batch)
+                        messages.extend(batch)
+                        checkpoint.numReceived += len(batch)
+
+                finally:
+                    # Received messages are written even if receiving failed
+                    storage.waitPendingJobsDone()
+
+                # Save checkpoint only after messages are on disk,
+                # so a crash never marks unsaved messages as seen.
+                # Without checkpoint ID index is rebuilt next time
+                if not storage.failed:
+                    checkpoint.lastDumpTime = time()
+                    checkpoint.numDumps += 1
+                    storage.saveCheckpoint(checkpoint)
+
+            finally:
+                self._storageManager.closeQueue(queueInfo.name)
+                self.enforceStorageLimits()
 
         Thread(target=threadedReceive).start()
 
@@ -181,6 +215,7 @@ class CentralWidget(QWidget):
 
         # Remove tab
         self._messageTabs.removeTab(index)
+        self._storageManager.closeQueue(queueName)
 
     def initUserInterface(self):
 
@@ -0,0 +1,422 @@
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import (
+    QColor,
+    QFontDatabase,
+    QSyntaxHighlighter,
+    QTextCharFormat,
+    QTextCursor,
+    QTextDocument,
+)
+from PyQt5.QtWidgets import (
+    QPlainTextEdit,
+    QSplitter,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from ..receiver import Message
+
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from xml.dom import minidom
+from xml.parsers.expat import ExpatError
+import json
+import re
+
+
+# Characters inserted into body view per event loop iteration
+RENDER_CHUNK_SIZE = 32 * 1024
+
+
+class Syntax(str, Enum):
+    text = "text"
+    json = "json"
+    xml = "xml"
+
+
+class Token(int, Enum):
+    key = 0
+    string = 1
+    number = 2
+    literal = 3
+    tag = 4
+    attribute = 5
+    comment = 6
+
+
+_TOKEN_COLORS = {
+    Token.key: "#0451a5",
+    Token.string: "#a31515",
+    Token.number: "#098658",
+    Token.literal: "#0000ff",
+    Token.tag: "#800000",
+    Token.attribute: "#e50000",
+    Token.comment: "#008000",
+}
+
+_JSON_TOKEN = re.compile(
+    r'(?P<string>"(?:[^"\\]|\\.)*")(?P<key>\s*:)?'
+    r"|(?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<literal>\btrue\b|\bfalse\b|\bnull\b)"
+)
+
+_XML_COMMENT_OR_TAG = re.compile(r"(?P<comment><!--.*?-->)|<[^<>]*>", re.DOTALL)
+_XML_TAG_NAME = re.compile(r"</?[?!]?[\w:.-]+|/?\??>")
+_XML_ATTRIBUTE = re.compile(
+    r"(?P<attribute>[\w:.-]+)\s*=\s*(?P<string>\"[^\"]*\"|'[^']*')"
+)
+
+
+@dataclass
+class MessageDetails:
+
+    """Message prepared for display: formatted body with positions of
+    tokens to highlight (in UTF-16 code units, as Qt counts them)"""
+
+    text: str
+    syntax: Syntax = Syntax.text
+    tokenStarts: array = field(default_factory=lambda: array("l"))
+    tokenLengths: array = field(default_factory=lambda: array("l"))
+    tokenKinds: bytes = b""
+    fields: List[Tuple[str, str]] = field(default_factory=list)
+    attributes: List[Tuple[str, str, str]] = field(default_factory=list)
+    sysAttributes: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def formatBody(body: str) -> Tuple[str, Syntax]:
+
+    """Pretty-prints JSON and XML bodies. Other bodies are kept as they are"""
+
+    start = body.lstrip()[:1]
+
+    if start in ("{", "["):
+        try:
+            text = json.dumps(json.loads(body), indent=2, ensure_ascii=False)
+            return text, Syntax.json
+        except ValueError:
+            pass
+
+    elif start == "<":
+        try:
+            document = minidom.parseString(body.encode())
+        except (ExpatError, ValueError):
+            pass
+        else:
+            # Drop blank lines left of whitespace between tags
+            text = document.toprettyxml(indent="  ")
+            lines = [line for line in text.splitlines() if line.strip()]
+            return "\n".join(lines), Syntax.xml
+
+    return body, Syntax.text
+
+
+def _jsonTokens(text: str):
+
+    for match in _JSON_TOKEN.finditer(text):
+        if match.group("string") is not None:
+            kind = Token.key if match.group("key") else Token.string
+            yield match.start("string"), match.end("string"), kind
+        elif match.group("number") is not None:
+            yield match.start(), match.end(), Token.number
+        else:
+            yield match.start(), match.end(), Token.literal
+
+
+def _xmlTokens(text: str):
+
+    for match in _XML_COMMENT_OR_TAG.finditer(text):
+        if match.group("comment") is not None:
+            yield match.start(), match.end(), Token.comment
+            continue
+
+        start = match.start()
+        tag = match.group()
+        for name in _XML_TAG_NAME.finditer(tag):
+            yield start + name.start(), start + name.end(), Token.tag
+
+        for attribute in _XML_ATTRIBUTE.finditer(tag):
+            yield start + attribute.start(1), start + attribute.end(1), Token.attribute
+            yield start + attribute.start(2), start + attribute.end(2), Token.string
+
+
+def _tokenize(details: MessageDetails):
+
+    if details.syntax == Syntax.json:
+        tokens = _jsonTokens(details.text)
+    elif details.syntax == Syntax.xml:
+        tokens = sorted(_xmlTokens(details.text))
+    else:
+        return
+
+    # Characters out of BMP take two UTF-16 code units
+    astral = [i for i, char in enumerate(details.text) if char > "\uffff"]
+
+    kinds = bytearray()
+    for start, end, kind in tokens:
+        if astral:
+            start += bisect_right(astral, start - 1)
+            end += bisect_right(astral, end - 1)
+        details.tokenStarts.append(start)
+        details.tokenLengths.append(end - start)
+        kinds.append(kind)
+
+    details.tokenKinds = bytes(kinds)
+
+
+def _attributeValue(data: Dict[str, Any]) -> str:
+
+    if "StringValue" in data:
+        return data["StringValue"]
+
+    if "BinaryValue" in data:
+        value = bytes(data["BinaryValue"])
+        suffix = " ..." if len(value) > 32 else ""
+        return f"<{len(value)} bytes> {value[:32].hex(' ')}{suffix}"
+
+    return json.dumps({k: v for k, v in data.items() if k != "DataType"})
+
+
+def prepareDetails(message: Message) -> MessageDetails:
+
+    """Formats body, finds tokens to highlight and lists
+    attributes of message. Runs in a worker thread"""
+
+    text, syntax = formatBody(message.body)
+    details = MessageDetails(text, syntax)
+    _tokenize(details)
+
+    details.fields = [
+        ("Message ID", message.id),
+        ("MD5 of body", message.md5OfBody),
+        ("MD5 of attributes", message.md5OfAttributes or ""),
+        ("Receipt handle", message.receiptHandle),
+    ]
+
+    for name, data in sorted((message.attributes or {}).items()):
+        details.attributes.append(
+            (name, data.get("DataType", ""), _attributeValue(data))
+        )
+
+    details.sysAttributes = sorted(message.sysAttributes.items())
+    return details
+
+
+class BodyHighlighter(QSyntaxHighlighter):
+
+    """Applies token positions found by `prepareDetails`.
+    Highlighting a block is a lookup, nothing is parsed"""
+
+    _formats: Dict[int, QTextCharFormat]
+    _details: Optional[MessageDetails]
+
+    def __init__(self, document: QTextDocument):
+        super().__init__(document)
+        self._details = None
+        self._formats = {}
+
+        for kind, color in _TOKEN_COLORS.items():
+            charFormat = QTextCharFormat()
+            charFormat.setForeground(QColor(color))
+            self._formats[kind] = charFormat
+
+    def setDetails(self, details: Optional[MessageDetails]):
+        self._details = details
+
+    def highlightBlock(self, text: str):
+
+        details = self._details
+        if details is None or not details.tokenKinds:
+            return
+
+        blockStart = self.currentBlock().position()
+        blockEnd = blockStart + self.currentBlock().length()
+        starts = details.tokenStarts
+
+        # Token starting before the block may span into it
+        i = max(bisect_right(starts, blockStart) - 1, 0)
+        while i < len(starts) and starts[i] < blockEnd:
+            start = starts[i] - blockStart
+            end = start + details.tokenLengths[i]
+            if end > 0:
+                charFormat = self._formats[details.tokenKinds[i]]
+                self.setFormat(max(start, 0), end - max(start, 0), charFormat)
+            i += 1
+
+
+class MessageLoader(QObject):
+
+    """Loads and prepares messages for display in a worker thread.
+    Only the last requested message is delivered with `loaded`"""
+
+    loaded = pyqtSignal(object)
+    _prepared = pyqtSignal(int, object)
+
+    _fetchMessage: Callable[[Any], Message]
+    _generation: int
+    _executor: ThreadPoolExecutor
+
+    def __init__(self, fetchMessage: Callable[[Any], Message], parent=None):
+        super().__init__(parent)
+        self._fetchMessage = fetchMessage
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._prepared.connect(self._deliver)
+
+    def load(self, message: Any):
+        self._generation += 1
+        self._executor.submit(self._prepare, self._generation, message)
+
+    def cancel(self):
+        self._generation += 1
+
+    def _prepare(self, generation: int, message: Any):
+
+        # Skip messages selected and left before worker got to them
+        if generation != self._generation:
+            return
+
+        try:
+            details = prepareDetails(self._fetchMessage(message))
+        except Exception as e:
+            details = MessageDetails(f"Error - {e}")
+
+        self._prepared.emit(generation, details)
+
+    def _deliver(self, generation: int, details: MessageDetails):
+        if generation == self._generation:
+            self.loaded.emit(details)
+
+
+class MessageDetailsPane(QWidget):
+
+    """Shows body, attributes and system attributes of a message.
+
+    Message is loaded, formatted and tokenized in a worker thread. Body
+    is then inserted into the view chunk by chunk, one chunk per event
+    loop iteration, so a large body does not block the window.
+    """
+
+    _loader: MessageLoader
+    _bodyView: QPlainTextEdit
+    _propsTree: QTreeWidget
+    _highlighter: BodyHighlighter
+    _renderTimer: QTimer
+    _details: Optional[MessageDetails]
+    _rendered: int
+
+    def __init__(self, fetchMessage: Callable[[Any], Message], parent=None):
+        super().__init__(parent)
+        self._details = None
+        self._rendered = 0
+        self._loader = MessageLoader(fetchMessage, self)
+        self._loader.loaded.connect(self._showDetails)
+        self.initUserInterface()
+
+    def initUserInterface(self):
+
+        bodyView = QPlainTextEdit()
+        bodyView.setReadOnly(True)
+        bodyView.setPlaceholderText("Select message to see its body")
+        bodyView.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        bodyView.document().setUndoRedoEnabled(False)
+
+        # Wrapping makes Qt lay out long lines again on every
+        # chunk, one-line bodies would block the window
+        bodyView.setLineWrapMode(QPlainTextEdit.NoWrap)
+
+        propsTree = QTreeWidget()
+        propsTree.setColumnCount(3)
+        propsTree.setHeaderLabels(["Name", "Type", "Value"])
+
+        renderTimer = QTimer(self)
+        renderTimer.setInterval(0)
+        renderTimer.timeout.connect(self._renderChunk)
+
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(bodyView)
+        splitter.addWidget(propsTree)
+        splitter.setStretchFactor(0, 2)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(splitter)
+
+        self._bodyView = bodyView
+        self._propsTree = propsTree
+        self._highlighter = BodyHighlighter(bodyView.document())
+        self._renderTimer = renderTimer
+        self.setLayout(layout)
+
+    def showMessage(self, message: Any):
+
+        """Starts loading message. Message may be a summary
+        to be fetched from storage by worker"""
+
+        self._loader.load(message)
+
+    def clear(self):
+        self._loader.cancel()
+        self._reset(None)
+
+    def details(self) -> Optional[MessageDetails]:
+        return self._details
+
+    def isRendering(self) -> bool:
+        return self._renderTimer.isActive()
+
+    def _reset(self, details: Optional[MessageDetails]):
+
+        self._renderTimer.stop()
+        self._details = details
+        self._rendered = 0
+        self._highlighter.setDetails(details)
+        self._bodyView.clear()
+        self._propsTree.clear()
+
+    def _showDetails(self, details: MessageDetails):
+
+        self._reset(details)
+        self._addProps(
+            "Message",
+            [(name, "", value) for name, value in details.fields],
+        )
+        self._addProps("Attributes", details.attributes)
+        self._addProps(
+            "System attributes",
+            [(name, "", value) for name, value in details.sysAttributes],
+        )
+
+        self._renderChunk()
+        if self._rendered < len(details.text):
+            self._renderTimer.start()
+
+    def _addProps(self, title: str, rows: List[Tuple[str, str, str]]):
+
+        section = QTreeWidgetItem(self._propsTree, [title])
+        for row in rows:
+            QTreeWidgetItem(section, list(row))
+
+        section.setExpanded(True)
+
+    def _renderChunk(self):
+
+        details = self._details
+        if details is None:
+            self._renderTimer.stop()
+            return
+
+        chunk = details.text[self._rendered : self._rendered + RENDER_CHUNK_SIZE]
+        cursor = QTextCursor(self._bodyView.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(chunk)
+
+        self._rendered += len(chunk)
+        if self._rendered >= len(details.text):
+            self._renderTimer.stop()
+            self._bodyView.moveCursor(QTextCursor.Start)
@@ -1,8 +1,17 @@
-from PyQt5.QtCore import Qt, QSortFilterProxyModel, pyqtSignal, QModelIndex, QDateTime
-from PyQt5.QtGui import QIcon, QStandardItemModel, QStandardItem
+from PyQt5.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QObject,
+    QTimer,
+    pyqtSignal,
+    QModelIndex,
+    QDateTime,
+)
+from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import (
     QAbstractItemView,
     QHeaderView,
+    QSplitter,
     QTableView,
     QPushButton,
     QVBoxLayout,
@@ -11,10 +20,16 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
-from ..receiver import SQSMessage
+from ..receiver import Message
+from ..storage import MessageStorage, MessageSummary
+from .message_details_pane import MessageDetailsPane
 
-from dataclasses import dataclass
-from typing import List
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 from enum import Enum
 
 
@@ -24,67 +39,566 @@ class Columns(int, Enum):
     messageBody = 2
 
 
-@dataclass
-class MessageItem:
-    sendTimestamp: str
-    sendDate: str
-    messageBody: str
+PREVIEW_LENGTH = 256
+
+MessageRow = Union[Message, MessageSummary]
+
+
+class _SortIndex:
+
+    """Rows of a model sorted by key, ascending, along with their keys"""
+
+    __slots__ = ("rows", "keys")
+
+    def __init__(self, rows: array, keys: Union[array, List[str]]):
+        self.rows = rows
+        self.keys = keys
+
+    def insert(self, rows: Sequence[int], keys: Sequence[Any]) -> bool:
+
+        """Merges rows into index. Rows with keys equal to ones in index go
+        after them. Returns True if all rows went to the end of index"""
+
+        pairs = sorted(zip(keys, rows))
+        if not self.keys or pairs[0][0] >= self.keys[-1]:
+            self.keys.extend(key for key, _ in pairs)
+            self.rows.extend(row for _, row in pairs)
+            return True
+
+        # Copy runs of index between insertion points,
+        # so a batch costs one pass over index at most
+        oldKeys, oldRows = self.keys, self.rows
+        newKeys, newRows = oldKeys[:0], oldRows[:0]
+        start = 0
+
+        for key, row in pairs:
+            end = bisect_right(oldKeys, key, start)
+            newKeys += oldKeys[start:end]
+            newRows += oldRows[start:end]
+            newKeys.append(key)
+            newRows.append(row)
+            start = end
+
+        newKeys += oldKeys[start:]
+        newRows += oldRows[start:]
+        self.keys, self.rows = newKeys, newRows
+        return False
+
+    def position(self, row: int, key: Any) -> int:
+
+        position = bisect_left(self.keys, key)
+        while self.rows[position] != row:
+            position += 1
+
+        return position
+
+
+def _preview(message: MessageRow) -> str:
+
+    if type(message) is MessageSummary:
+        return message.preview  # type: ignore
+
+    return message.body[:PREVIEW_LENGTH]  # type: ignore
+
+
+class MessagesModel(QAbstractTableModel):
+
+    """Table of messages with columnar storage.
+
+    Model keeps only a SentTimestamp array and a reference to each
+    message (received `Message` or stored `MessageSummary`). Cell text
+    (date, body preview) is made in `data()`, which views call for
+    visible rows only, so a row costs a few dozen bytes instead of three
+    `QStandardItem` objects.
+
+    Model sorts itself: for each sorted column it keeps rows ordered by
+    native keys (timestamps for both timestamp and date columns, body
+    previews for body column), merged with new rows on insert. Changing
+    sort order only flips the mapping of view rows to stored ones.
+
+    Model filters itself too. While filter is on, only rows added with
+    `addMatches` are shown, kept in sort order the same way.
+    """
+
+    _labels = ["Send timestamp", "Send date", "Message body"]
+    _timestamps: array
+    _messages: List[MessageRow]
+
+    _sortColumn: Columns
+    _sortOrder: Qt.SortOrder
+    _sortIndexes: Dict[Columns, _SortIndex]
+    _matchIndex: Optional[_SortIndex]
+    _unsorted: List[int]
 
-class CustomSortProxyModel(QSortFilterProxyModel):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self._timestamps = array("q")
+        self._messages = []
+        self._sortColumn = Columns.sendTimestamp
+        self._sortOrder = Qt.AscendingOrder
+        self._sortIndexes = {
+            Columns.sendTimestamp: self._makeSortIndex(Columns.sendTimestamp, ())
+        }
+        self._matchIndex = None
+        self._unsorted = []
 
-    def filterAcceptsRow(self, sourceRow: int, sourceParent: QModelIndex) -> bool:
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
 
-        filterRegExp = self.filterRegExp()
-        if filterRegExp.isEmpty():
-            return True
+        if parent.isValid():
+            return 0
+
+        return len(self._visibleIndex().rows) + len(self._unsorted)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+
+        if parent.isValid():
+            return 0
+
+        return len(Columns)
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.DisplayRole,
+    ) -> Any:
 
-        sourceModel = self.sourceModel()
-        indexBody = sourceModel.index(sourceRow, Columns.messageBody, sourceParent)
-        return filterRegExp.indexIn(sourceModel.data(indexBody)) != -1
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self._labels[section]
 
-    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        return None
 
-        # No knowledge how to change sort column. First by default
-        assert left.column() == Columns.sendTimestamp
-        assert right.column() == Columns.sendTimestamp
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
 
-        # Compare timestamp
-        leftData = self.sourceModel().data(left)
-        rightData = self.sourceModel().data(right)
-        return int(leftData) > int(rightData)
+        if not index.isValid():
+            return Qt.NoItemFlags
+
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+
+        row, column = self._storedRow(index.row()), index.column()
 
-    def sort(self, column: int, order: Qt.SortOrder) -> None:
         if column == Columns.sendTimestamp:
-            super().sort(column, order)
+            return str(self._timestamps[row])
+
+        if column == Columns.sendDate:
+            sendDate = datetime.fromtimestamp(self._timestamps[row] // 1000)
+            return sendDate.strftime("%c")
+
+        return _preview(self._messages[row])
+
+    def timestamp(self, row: int) -> int:
+        return self._timestamps[self._storedRow(row)]
+
+    def message(self, row: int) -> MessageRow:
+        return self._messages[self._storedRow(row)]
+
+    def storedMessages(self) -> List[MessageRow]:
+
+        """Returns list of all messages, indexed by stored rows. Messages are
+        only appended to it (`clear` makes a new list), so it can be read
+        from other threads"""
+
+        return self._messages
+
+    def sortedRows(self) -> array:
+
+        """Returns stored rows of all messages, in sort order"""
+
+        rows = self._sortIndexes[self._sortColumn].rows
+        if self._sortOrder == Qt.DescendingOrder:
+            return rows[::-1]
+
+        return rows[:]
+
+    @staticmethod
+    def _keyColumn(column: int) -> Columns:
+
+        if column == Columns.messageBody:
+            return Columns.messageBody
+
+        return Columns.sendTimestamp
+
+    def _sortKeys(self, column: Columns, rows: Sequence[int]):
+
+        if column == Columns.messageBody:
+            return [_preview(self._messages[row]) for row in rows]
+
+        if isinstance(rows, range):
+            return self._timestamps[rows.start : rows.stop]
+
+        return array("q", map(self._timestamps.__getitem__, rows))
+
+    def _makeSortIndex(self, column: Columns, rows: Sequence[int]) -> _SortIndex:
+
+        keys = self._sortKeys(column, rows)
+        positions = sorted(range(len(keys)), key=keys.__getitem__)
+        sortedRows = array("q", [rows[position] for position in positions])
+        sortedKeys = [keys[position] for position in positions]
+
+        if column == Columns.sendTimestamp:
+            return _SortIndex(sortedRows, array("q", sortedKeys))
+
+        return _SortIndex(sortedRows, sortedKeys)
+
+    def _visibleIndex(self) -> _SortIndex:
+
+        if self._matchIndex is not None:
+            return self._matchIndex
+
+        return self._sortIndexes[self._sortColumn]
+
+    def _storedRow(self, row: int) -> int:
+
+        """Maps row of view to row of stored message"""
+
+        rows = self._visibleIndex().rows
+        numSorted = len(rows)
+
+        # Rows just inserted and not sorted yet are at the end
+        if row >= numSorted:
+            return self._unsorted[row - numSorted]
+
+        if self._sortOrder == Qt.DescendingOrder:
+            return rows[numSorted - 1 - row]
+
+        return rows[row]
+
+    def _viewRow(self, storedRow: int) -> int:
+
+        sortIndex = self._visibleIndex()
+        key = self._sortKeys(self._sortColumn, (storedRow,))[0]
+        position = sortIndex.position(storedRow, key)
+
+        if self._sortOrder == Qt.DescendingOrder:
+            return len(sortIndex.rows) - 1 - position
+
+        return position
+
+    def _changeLayout(self, change: Callable[[], None]):
+
+        """Reorders rows with `change`, keeping persistent
+        indexes (e.g. selection) on the same messages"""
+
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        storedRows = [self._storedRow(index.row()) for index in persistent]
+
+        change()
+
+        self.changePersistentIndexList(
+            persistent,
+            [
+                self.index(self._viewRow(row), index.column())
+                for row, index in zip(storedRows, persistent)
+            ],
+        )
+        self.layoutChanged.emit()
+
+    def _showRows(self, rows: Sequence[int], keys: Sequence[Any], sortRows):
+
+        """Inserts stored rows into view. `sortRows` adds them to
+        sort index of visible rows, keys are ones of that index"""
+
+        numRows = self.rowCount()
+        visibleKeys = self._visibleIndex().keys
+
+        # Often new messages are the latest ones. Then they are
+        # inserted either at the top or at the bottom of sorted rows
+        if not visibleKeys or min(keys) >= visibleKeys[-1]:
+            if self._sortOrder == Qt.AscendingOrder:
+                self.beginInsertRows(QModelIndex(), numRows, numRows + len(rows) - 1)
+            else:
+                self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+
+            sortRows()
+            self.endInsertRows()
+            return
+
+        # Otherwise rows are inserted at the bottom, then moved into place
+        self.beginInsertRows(QModelIndex(), numRows, numRows + len(rows) - 1)
+        self._unsorted = list(rows)
+        self.endInsertRows()
+
+        def change():
+            sortRows()
+            self._unsorted = []
+
+        self._changeLayout(change)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+
+        keyColumn = self._keyColumn(column)
+        if keyColumn == self._sortColumn and order == self._sortOrder:
+            return
+
+        def change():
+
+            if keyColumn not in self._sortIndexes:
+                allRows = range(len(self._messages))
+                self._sortIndexes[keyColumn] = self._makeSortIndex(keyColumn, allRows)
+
+            if self._matchIndex is not None:
+                matches = self._matchIndex.rows
+                self._matchIndex = self._makeSortIndex(keyColumn, matches)
+
+            self._sortColumn = keyColumn
+            self._sortOrder = order
+
+        self._changeLayout(change)
+
+    def appendMessages(self, messages: Sequence[MessageRow]) -> range:
+
+        """Adds messages to table. Returns their stored rows"""
+
+        first = len(self._messages)
+        if not messages:
+            return range(first, first)
+
+        timestamps = array("q")
+        for message in messages:
+            if type(message) is MessageSummary:
+                timestamps.append(message.sentTimestamp)  # type: ignore
+            else:
+                sysAttributes = message.sysAttributes  # type: ignore
+                timestamps.append(int(sysAttributes.get("SentTimestamp", 0)))
+
+        # Stored rows are not visible until added to sort index
+        self._timestamps.extend(timestamps)
+        self._messages.extend(messages)
+        newRows = range(first, len(self._messages))
+        newKeys = {
+            column: self._sortKeys(column, newRows) for column in self._sortIndexes
+        }
+
+        def sortRows():
+            for column, sortIndex in self._sortIndexes.items():
+                sortIndex.insert(newRows, newKeys[column])
+
+        # Filtered out until matched
+        if self._matchIndex is not None:
+            sortRows()
+        else:
+            self._showRows(newRows, newKeys[self._sortColumn], sortRows)
+
+        return newRows
+
+    def startFilter(self):
+
+        """Hides all rows. Rows are shown again with `addMatches`"""
+
+        self.beginResetModel()
+        self._matchIndex = self._makeSortIndex(self._sortColumn, ())
+        self.endResetModel()
+
+    def addMatches(self, rows: Sequence[int]):
+
+        """Shows stored rows matching filter"""
+
+        if self._matchIndex is None or not rows:
+            return
+
+        keys = self._sortKeys(self._sortColumn, rows)
+        matchIndex = self._matchIndex
+        self._showRows(rows, keys, lambda: matchIndex.insert(rows, keys))
+
+    def clearFilter(self):
+
+        if self._matchIndex is None:
+            return
+
+        self.beginResetModel()
+        self._matchIndex = None
+        self.endResetModel()
+
+    def isFiltered(self) -> bool:
+        return self._matchIndex is not None
+
+    def clear(self):
+        self.beginResetModel()
+        self._timestamps = array("q")
+        self._messages = []
+        self._sortIndexes = {
+            column: self._makeSortIndex(column, ()) for column in self._sortIndexes
+        }
+        if self._matchIndex is not None:
+            self._matchIndex = self._makeSortIndex(self._sortColumn, ())
+        self.endResetModel()
+
+
+class MessagesBridge(QObject):
+
+    """Delivers messages from receiving threads to GUI thread.
+
+    `post` may be called from any thread. Posted messages are collected
+    and delivered with a single `delivered` signal on GUI thread, at most
+    once per `interval` milliseconds, so a model gets one insertion per
+    interval however fast messages are received.
+    """
+
+    delivered = pyqtSignal(list)
+    _posted = pyqtSignal()
+
+    _lock: Lock
+    _pending: List[MessageRow]
+    _timer: QTimer
+
+    def __init__(self, interval: int = 50, parent=None):
+        super().__init__(parent)
+        self._lock = Lock()
+        self._pending = []
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+        # Timer can be started only on its thread. Signal emitted
+        # from other threads is queued to the thread of bridge
+        self._posted.connect(self._timer.start)
+
+    def post(self, messages: Sequence[MessageRow]):
+
+        with self._lock:
+            wasEmpty = not self._pending
+            self._pending.extend(messages)
+
+        if wasEmpty and messages:
+            self._posted.emit()
+
+    def flush(self):
+
+        with self._lock:
+            messages, self._pending = self._pending, []
+
+        if messages:
+            self.delivered.emit(messages)
+
+
+class MessagesSearch(QObject):
+
+    """Searches message bodies in a worker thread.
+
+    Each `search` cancels the previous one. Rows are scanned in chunks,
+    matches of each chunk are delivered with `matched` signal on GUI
+    thread. Matches of cancelled searches are dropped, even if they were
+    already found.
+    """
+
+    matched = pyqtSignal(list)
+    _found = pyqtSignal(int, list)
+
+    _readBody: Callable[[MessageRow], str]
+    _chunkSize: int
+    _generation: int
+    _text: str
+    _executor: ThreadPoolExecutor
+
+    def __init__(
+        self,
+        readBody: Callable[[MessageRow], str],
+        chunkSize: int = 1000,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._readBody = readBody
+        self._chunkSize = chunkSize
+        self._generation = 0
+        self._text = ""
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._found.connect(self._deliver)
+
+    def search(self, text: str, rows: Sequence[int], messages: List[MessageRow]):
+
+        """Starts case-insensitive search of text
+        in bodies of messages at stored rows"""
+
+        self._generation += 1
+        self._text = text.casefold()
+        self.extend(rows, messages)
+
+    def extend(self, rows: Sequence[int], messages: List[MessageRow]):
+
+        """Searches more rows (e.g. of newly received messages)
+        for current text. Does nothing if no search is active"""
+
+        if self._text and rows:
+            self._executor.submit(
+                self._scan, self._generation, self._text, rows, messages
+            )
+
+    def cancel(self):
+        self._generation += 1
+        self._text = ""
+
+    def _scan(
+        self,
+        generation: int,
+        text: str,
+        rows: Sequence[int],
+        messages: List[MessageRow],
+    ):
+        for start in range(0, len(rows), self._chunkSize):
+
+            if generation != self._generation:
+                return
+
+            matches = []
+            for row in rows[start : start + self._chunkSize]:
+                try:
+                    body = self._readBody(messages[row])
+                except Exception as e:
+                    # Damaged or removed message, e.g. a truncated
+                    # record, must not stop search of other rows
+                    print(f"Error - {e}")
+                    continue
+
+                if text in body.casefold():
+                    matches.append(row)
+
+            if matches:
+                self._found.emit(generation, matches)
+
+    def _deliver(self, generation: int, rows: List[int]):
+
+        # Search might be cancelled after rows were found
+        if generation == self._generation:
+            self.matched.emit(rows)
+
 
 class MessagesPane(QWidget):
 
     """Displays list of messages"""
 
-    def __init__(self, parent: QWidget):
+    _storage: Optional[MessageStorage]
+
+    def __init__(self, parent: QWidget, searchDelay: int = 300):
         super().__init__(parent)
-        self.initUserInterface()
+        self._storage = None
+        self.initUserInterface(searchDelay)
 
-    def initUserInterface(self):
+    def initUserInterface(self, searchDelay: int):
 
-        labels = ["Send timestamp", "Send date", "Message body"]
-        dataModel = QStandardItemModel(0, len(Columns))
-        dataModel.setHorizontalHeaderLabels(labels)
+        dataModel = MessagesModel(self)
+        bridge = MessagesBridge(parent=self)
+        bridge.delivered.connect(self._onMessagesDelivered)
 
-        proxyModel = CustomSortProxyModel()
-        proxyModel.setSourceModel(dataModel)
-        proxyModel.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        search = MessagesSearch(self._readBody, parent=self)
+        search.matched.connect(dataModel.addMatches)
 
         tableView = QTableView()
-        tableView.setModel(proxyModel)
+        tableView.setModel(dataModel)
         tableView.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         tableView.setSelectionBehavior(QAbstractItemView.SelectRows)
         tableView.setColumnHidden(Columns.sendTimestamp, True)
-        tableView.setSortingEnabled(True)
 
         hHeader = tableView.horizontalHeader()
+        hHeader.setSortIndicator(Columns.sendDate, Qt.AscendingOrder)
+        tableView.setSortingEnabled(True)
         hHeader.setSectionResizeMode(QHeaderView.Interactive)
         hHeader.setSectionResizeMode(Columns.messageBody, QHeaderView.Stretch)
         # hHeader.resizeSections(QHeaderView.ResizeToContents)
@@ -93,34 +607,101 @@ class MessagesPane(QWidget):
         vHeader = tableView.verticalHeader()
         vHeader.setVisible(False)
 
+        # Search starts when user stops typing
+        searchTimer = QTimer(self)
+        searchTimer.setSingleShot(True)
+        searchTimer.setInterval(searchDelay)
+        searchTimer.timeout.connect(self._startSearch)
+
         searchField = QLineEdit()
         searchField.setPlaceholderText("Search in message body")
         searchField.addAction(QIcon(":search.svg"), QLineEdit.LeadingPosition)
-        searchField.textChanged.connect(proxyModel.setFilterFixedString)
+        searchField.textChanged.connect(searchTimer.start)
+
+        # Full message is loaded only when its row is selected
+        detailsPane = MessageDetailsPane(self._fetchMessage)
+        selectionModel = tableView.selectionModel()
+        selectionModel.currentRowChanged.connect(self._onCurrentRowChanged)
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(tableView)
+        splitter.addWidget(detailsPane)
+        splitter.setStretchFactor(0, 2)
 
         layout = QVBoxLayout()
-        layout.addWidget(tableView)
+        layout.addWidget(splitter)
         layout.addWidget(searchField)
 
         self._tableView = tableView
         self._dataModel = dataModel
+        self._bridge = bridge
+        self._search = search
+        self._searchField = searchField
+        self._detailsPane = detailsPane
         self.setLayout(layout)
 
-    def clear(self):
-        self._dataModel.clear()
+    def setStorage(self, storage: MessageStorage):
+
+        """Sets storage to read stored messages (summaries) from,
+        for search and for message details"""
+
+        self._storage = storage
+
+    def _readBody(self, message: MessageRow) -> str:
+
+        if type(message) is not MessageSummary:
+            return message.body  # type: ignore
+
+        if self._storage is None:
+            return message.preview  # type: ignore
+
+        return str(self._storage.readBody(message), "utf-8", "ignore")  # type: ignore
+
+    def _fetchMessage(self, message: MessageRow) -> Message:
 
-    def addItem(self, item: MessageItem):
+        if type(message) is not MessageSummary:
+            return message  # type: ignore
 
-        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if self._storage is None:
+            raise KeyError(message.id)
 
-        itemTimestamp = QStandardItem(item.sendTimestamp)
-        itemTimestamp.setFlags(flags)
+        return self._storage.fetchMessage(message)  # type: ignore
+
+    def _onCurrentRowChanged(self, current: QModelIndex, previous: QModelIndex):
+
+        if not current.isValid():
+            self._detailsPane.clear()
+            return
+
+        self._detailsPane.showMessage(self._dataModel.message(current.row()))
+
+    def _startSearch(self):
+
+        text = self._searchField.text()
+        if not text:
+            self._search.cancel()
+            self._dataModel.clearFilter()
+            return
+
+        self._dataModel.startFilter()
+        self._search.search(
+            text,
+            self._dataModel.sortedRows(),
+            self._dataModel.storedMessages(),
+        )
+
+    def _onMessagesDelivered(self, messages: List[MessageRow]):
+
+        rows = self._dataModel.appendMessages(messages)
+        self._search.extend(rows, self._dataModel.storedMessages())
+
+    def clear(self):
+        self._bridge.flush()
+        self._dataModel.clear()
+        self._startSearch()
 
-        itemDate = QStandardItem(item.sendDate)
-        itemDate.setFlags(flags)
+    def addMessages(self, messages: Sequence[MessageRow]):
 
-        itemBody = QStandardItem(item.messageBody)
-        itemBody.setFlags(flags)
+        """Adds messages to table. Can be called from any thread"""
 
-        row = [itemTimestamp, itemDate, itemBody]
-        self._dataModel.appendRow(row)
\ No newline at end of file
+        self._bridge.post(messages)
@@ -0,0 +1,200 @@
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from threading import Thread
+from typing import BinaryIO, FrozenSet, Iterable, List, Optional, Set, Tuple
+import struct
+import sys
+
+
+_KEY_MASK = (1 << 64) - 1
+_FILE_MAGIC = b"SQSGIDX1"
+_FILE_HEADER = struct.Struct("<8sQ")
+
+
+def message_key(message_id: str) -> int:
+
+    """Converts message ID to a 128-bit integer key.
+
+    SQS message IDs are UUIDs, so the key is exact for them.
+    Other IDs (custom SQS implementations) are hashed.
+    """
+
+    if len(message_id) == 36 and message_id.count("-") == 4:
+        try:
+            return int(message_id.replace("-", ""), 16)
+        except ValueError:
+            pass
+
+    digest = blake2b(message_id.encode(), digest_size=16).digest()
+    return int.from_bytes(digest, "big")
+
+
+class MessageIdIndex:
+
+    """Compact set of message IDs.
+
+    IDs are stored as 128-bit keys split into two sorted arrays of
+    64-bit halves (16 bytes per ID, versus ~150 bytes for a UUID string
+    in a Python set). New keys go to a small set first. When it reaches
+    a fixed size, it is merged into the arrays by a background thread,
+    and merged arrays are swapped in when ready, so `add` never waits
+    for a merge, and a merge never holds GIL for long. Bulk `update`
+    sorts all new keys at once and merges them in one pass.
+    """
+
+    _state: Tuple[array, array, FrozenSet[int]]
+    """Sorted high and low halves of keys, keys being merged into them"""
+
+    _recent: Set[int]
+    _merge_thread: Optional[Thread]
+    _merge_size = 1 << 16
+
+    def __init__(self, message_ids: Iterable[str] = ()):
+        self._state = (array("Q"), array("Q"), frozenset())
+        self._recent = set()
+        self._merge_thread = None
+        self.update(message_ids)
+
+    def __len__(self) -> int:
+        hi, _, merging = self._state
+        return len(hi) + len(merging) + len(self._recent)
+
+    def __contains__(self, message_id: object) -> bool:
+
+        if not isinstance(message_id, str):
+            return False
+
+        return self._contains_key(message_key(message_id))
+
+    def _contains_key(self, key: int) -> bool:
+
+        # Keys leave recent set only after state holding them is
+        # set, so a key being merged is found in one of them
+        if key in self._recent:
+            return True
+
+        hi, lo, merging = self._state
+        return key in merging or _find_key(hi, lo, key) >= 0
+
+    def add(self, message_id: str):
+
+        key = message_key(message_id)
+        if self._contains_key(key):
+            return
+
+        self._recent.add(key)
+        if len(self._recent) >= self._merge_size and not self._state[2]:
+            self._start_merge()
+
+    def update(self, message_ids: Iterable[str]):
+
+        self._wait_merge()
+        hi, lo, _ = self._state
+
+        keys = set(map(message_key, message_ids))
+        keys.update(self._recent)
+        if hi:
+            keys = [key for key in keys if _find_key(hi, lo, key) < 0]
+
+        keys = sorted(keys)
+
+        self._state = (*_merge_keys(hi, lo, keys), frozenset())
+        self._recent = set()
+
+    def _start_merge(self):
+
+        hi, lo, _ = self._state
+        merging = frozenset(self._recent)
+        self._state = (hi, lo, merging)
+        self._recent = set()
+
+        self._merge_thread = Thread(
+            target=self._merge,
+            args=(hi, lo, merging),
+            daemon=True,
+        )
+        self._merge_thread.start()
+
+    def _merge(self, hi: array, lo: array, merging: FrozenSet[int]):
+        self._state = (*_merge_keys(hi, lo, sorted(merging)), frozenset())
+
+    def _wait_merge(self):
+        if self._merge_thread is not None:
+            self._merge_thread.join()
+            self._merge_thread = None
+
+    def save(self, f: BinaryIO):
+
+        self.update(())
+        hi, lo, _ = self._state
+        f.write(_FILE_HEADER.pack(_FILE_MAGIC, len(hi)))
+
+        for keys in (hi, lo):
+            if sys.byteorder == "big":
+                keys = array("Q", keys)
+                keys.byteswap()
+            keys.tofile(f)
+
+    @classmethod
+    def load(cls, f: BinaryIO) -> "MessageIdIndex":
+
+        magic, count = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+        if magic != _FILE_MAGIC:
+            raise ValueError("Not a message ID index file")
+
+        hi, lo = array("Q"), array("Q")
+        for keys in (hi, lo):
+            keys.fromfile(f, count)
+            if sys.byteorder == "big":
+                keys.byteswap()
+
+        index = cls()
+        index._state = (hi, lo, frozenset())
+        return index
+
+
+def _find_key(hi: array, lo: array, key: int) -> int:
+
+    """Returns position of key in sorted halves, or -1"""
+
+    key_hi, key_lo = key >> 64, key & _KEY_MASK
+    i = bisect_left(hi, key_hi)
+
+    while i < len(hi) and hi[i] == key_hi:
+        if lo[i] == key_lo:
+            return i
+        i += 1
+
+    return -1
+
+
+def _merge_keys(hi: array, lo: array, keys: List[int]) -> Tuple[array, array]:
+
+    """Merges sorted keys missing from sorted halves. Runs of
+    existing halves between new keys are copied whole"""
+
+    if not hi:
+        return (
+            array("Q", [key >> 64 for key in keys]),
+            array("Q", [key & _KEY_MASK for key in keys]),
+        )
+
+    merged_hi, merged_lo = array("Q"), array("Q")
+    start = 0
+
+    for key in keys:
+        key_hi, key_lo = key >> 64, key & _KEY_MASK
+        end = bisect_left(hi, key_hi, start)
+        while end < len(hi) and hi[end] == key_hi and lo[end] < key_lo:
+            end += 1
+
+        merged_hi += hi[start:end]
+        merged_lo += lo[start:end]
+        merged_hi.append(key_hi)
+        merged_lo.append(key_lo)
+        start = end
+
+    merged_hi += hi[start:]
+    merged_lo += lo[start:]
+    return merged_hi, merged_lo
@@ -0,0 +1,127 @@
+from typing import Any, Callable, Dict, Optional
+
+
+class LazyValue:
+
+    """Placeholder for message field decoded on first access"""
+
+    __slots__ = ("load",)
+
+    def __init__(self, load: Callable[[], Any]):
+        self.load = load
+
+
+class Message:
+
+    """Received message.
+
+    Slotted record without validation: received and loaded messages
+    are already well formed, and dumps hold hundreds of thousands of
+    them. `attributes` and `sysAttributes` may be passed as `LazyValue`
+    to postpone their decoding until they are accessed.
+    """
+
+    __slots__ = (
+        "id",
+        "body",
+        "md5OfBody",
+        "md5OfAttributes",
+        "receiptHandle",
+        "_attributes",
+        "_sysAttributes",
+    )
+
+    _fields = (
+        "id",
+        "body",
+        "md5OfBody",
+        "attributes",
+        "md5OfAttributes",
+        "sysAttributes",
+        "receiptHandle",
+    )
+
+    id: str
+    body: str
+    md5OfBody: str
+    md5OfAttributes: Optional[str]
+    receiptHandle: str
+
+    def __init__(
+        self,
+        id: str,
+        body: str,
+        md5OfBody: str,
+        attributes: Optional[Dict[str, dict]] = None,
+        md5OfAttributes: Optional[str] = None,
+        sysAttributes: Optional[Dict[str, str]] = None,
+        receiptHandle: str = "",
+    ):
+        self.id = id
+        self.body = body
+        self.md5OfBody = md5OfBody
+        self.md5OfAttributes = md5OfAttributes
+        self.receiptHandle = receiptHandle
+        self._attributes = attributes
+        self._sysAttributes = sysAttributes if sysAttributes is not None else {}
+
+    @property
+    def attributes(self) -> Optional[Dict[str, dict]]:
+
+        value = self._attributes
+        if type(value) is LazyValue:
+            value = self._attributes = value.load()
+
+        return value
+
+    @attributes.setter
+    def attributes(self, value: Optional[Dict[str, dict]]):
+        self._attributes = value
+
+    @property
+    def sysAttributes(self) -> Dict[str, str]:
+
+        value = self._sysAttributes
+        if type(value) is LazyValue:
+            value = self._sysAttributes = value.load()
+
+        return value
+
+    @sysAttributes.setter
+    def sysAttributes(self, value: Dict[str, str]):
+        self._sysAttributes = value
+
+    def dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields}
+
+    @classmethod
+    def parse_obj(cls, obj: Dict[str, Any]) -> "Message":
+        return cls(**obj)
+
+    def __eq__(self, other: object) -> bool:
+
+        if not isinstance(other, Message):
+            return NotImplemented
+
+        return self.dict() == other.dict()
+
+    def __repr__(self) -> str:
+        return f"Message(id={self.id!r}, body={self.body[:32]!r})"
+
+    def __reduce__(self):
+
+        # Positional arguments pickle faster than slots state, which
+        # matters when loaded messages are passed between processes.
+        # Lazy values are pickled as they are, without loading them
+        return (
+            Message,
+            (
+                self.id,
+                self.body,
+                self.md5OfBody,
+                self._attributes,
+                self.md5OfAttributes,
+                self._sysAttributes,
+                self.receiptHandle,
+            ),
+        )
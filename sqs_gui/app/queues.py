@@ -1,12 +1,7 @@
 from dataclasses import dataclass
-from enum import Enum
-import queue
-import stat
 from typing import Dict, List, Optional
 from datetime import datetime
-from winsound import MessageBeep
-from .receiver import Credentials
-import boto3
+from .clients import Credentials, get_client
 
 
 @dataclass
@@ -43,48 +38,48 @@ _QUEUE_ATTRS = [
     "VisibilityTimeout",
 ]
 
-from mypy_boto3_sqs.client import SQSClient
-from mypy_boto3_sqs.service_resource import (
-    SQSServiceResource,
-    Queue as SQSQueue,
-)
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mypy_boto3_sqs.client import SQSClient
+else:
+    SQSClient = object
 
 
 class MessageQueue:
 
-    _queue: SQSQueue
+    _url: str
     _queue_name: str
-    _sqs: SQSServiceResource
+    _client: SQSClient
 
-    def __init__(self, queue: SQSQueue):
-        self._queue_name = self._get_queue_name(queue)
-        self._queue = queue
+    def __init__(self, client: SQSClient, url: str):
+        self._queue_name = self._get_queue_name(url)
+        self._client = client
+        self._url = url
 
     @property
     def name(self) -> str:
         return self._queue_name
 
-    @staticmethod
-    def _get_queue_name(queue: SQSQueue):
-        return queue.attributes["QueueArn"].split(":")[-1]
+    @property
+    def url(self) -> str:
+        return self._url
 
     def _get_queue_tags(self) -> Dict[str, str]:
-        client: SQSClient = self._queue.meta.client
-        resp: dict = client.list_queue_tags(QueueUrl=self._queue.url)
+        resp: dict = self._client.list_queue_tags(QueueUrl=self._url)
         return resp.get("Tags", dict())
 
     def _get_queue_attributes(self):
 
-        url = self._queue.url
-        client: SQSClient = self._queue.meta.client
-        resp = client.get_queue_attributes(QueueUrl=url, AttributeNames=["All"])
+        url = self._url
+        resp = self._client.get_queue_attributes(QueueUrl=url, AttributeNames=["All"])
         attrs = resp["Attributes"]
 
         return {name: attrs.get(name, "<Unknown>") for name in _QUEUE_ATTRS}
 
     @staticmethod
-    def _get_queue_name(queue: SQSQueue):
-        return queue.attributes.get("QueueArn", ":<Unknown>").split(":")[-1]
+    def _get_queue_name(url: str):
+        return url.rstrip("/").split("/")[-1]
 
     @staticmethod
     def _current_date():
@@ -96,7 +91,7 @@ class MessageQueue:
         numMessages = attributes["ApproximateNumberOfMessages"]
 
         return QueueInfo(
-            url=self._queue.url,
+            url=self._url,
             name=self._queue_name,
             numMessages=numMessages,
             attributes=attributes,
@@ -105,22 +100,16 @@ class MessageQueue:
         )
 
     def purge(self):
-        self._queue.purge()
-
-
-
-SERVICE_NAME = "sqs"
+        self._client.purge_queue(QueueUrl=self._url)
 
 
 def list_message_queues(credentials: Credentials):
 
-    session = boto3.Session()
-    sqs: SQSServiceResource = session.resource(
-        service_name=SERVICE_NAME,
-        region_name=credentials.region_name,
-        aws_access_key_id=credentials.access_key,
-        aws_secret_access_key=credentials.secret_key,
-        endpoint_url=credentials.endpoint_url,
-    )
+    client = get_client(credentials)
+    paginator = client.get_paginator("list_queues")
+
+    urls: List[str] = []
+    for page in paginator.paginate():
+        urls.extend(page.get("QueueUrls", []))
 
-    return [MessageQueue(queue) for queue in sqs.queues.all()]
+    return [MessageQueue(client, url) for url in urls]
@@ -1,29 +1,48 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from queue import Queue
-from threading import Lock, Thread
-from time import sleep
-from typing import Dict, Iterator, List, Optional, Set
-import boto3
+from enum import Enum
+from functools import partial
+from queue import Empty
+from threading import Condition, Event, Lock, Thread
+from time import monotonic
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+import asyncio
+import logging
 import os
 
-from pydantic import BaseModel
+try:
+    from aiobotocore.config import AioConfig  # type: ignore
+    from aiobotocore.session import get_session as get_aio_session  # type: ignore
+except ModuleNotFoundError:
+    get_aio_session = None
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from mypy_boto3_sqs.client import SQSClient
-    from mypy_boto3_sqs.service_resource import (
-        SQSServiceResource,
-        Message as SQSMessage,
-        Queue as SQSQueue,
-    )
+    from mypy_boto3_sqs.type_defs import MessageTypeDef as SQSMessage
 else:
-    SQSServiceResource = object
+    SQSClient = object
     SQSMessage = object
-    SQSQueue = object
 
+from .clients import SERVICE_NAME, Credentials, get_client, get_max_pool_connections
+from .id_index import MessageIdIndex
+from .message import Message
+from .scheduler import ReceiveScheduler
 from .util import random_string
 
+_logger = logging.getLogger(__name__)
+
 # def ping(self):
 #     try:
 #         self._client.list_queues(MaxResults=1)
@@ -44,36 +63,266 @@ class ReceiveConditions:
     """Receive messages until timeout expiration"""
 
 
-class Message(BaseModel):
-    id: str
-    body: str
-    md5OfBody: str
-    attributes: Optional[Dict[str, dict]]
-    md5OfAttributes: Optional[str]
-    sysAttributes: Dict[str, str]
-    receiptHandle: str
+class PollingMode(str, Enum):
+    short = "short"
+    long = "long"
+    adaptive = "adaptive"
+
+
+@dataclass
+class PollingOptions:
+
+    mode: PollingMode = PollingMode.adaptive
+    """Use short polling, long polling or switch between them"""
+
+    max_wait_time: int = 20
+    """Long polling wait time in seconds (20 is SQS maximum)"""
+
+    empty_receives_tolerance: int = 3
+    """Stop worker after N empty short polling responses in a row.
+    Empty long polling response stops it at once"""
+
+    hit_rate_threshold: float = 0.75
+    """Use long polling while hit rate is below this value"""
+
+    hit_rate_smoothing: float = 0.5
+    """Weight of the last response in the hit rate moving average"""
+
+
+class AdaptivePoller:
+
+    """Chooses `WaitTimeSeconds` for each receive call of a worker.
+
+    Dense queues return messages on almost every call, so short polling
+    is the cheapest way to drain them. On sparse or distributed queues
+    short polling samples only a subset of SQS servers and often returns
+    nothing, so after empty responses the poller switches to long polling.
+    Long polling samples all servers, so its empty response means that
+    queue is drained. Short polling gives up only after
+    `empty_receives_tolerance` misses in a row.
+    """
+
+    _options: PollingOptions
+    _hit_rate: float
+    _empty_receives: int
+
+    def __init__(self, options: PollingOptions):
+
+        if options.empty_receives_tolerance <= 0:
+            raise ValueError("empty_receives_tolerance must be greater than 0")
+
+        self._options = options
+        self._hit_rate = 1.0
+        self._empty_receives = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self._hit_rate
+
+    @property
+    def exhausted(self) -> bool:
+        return self._empty_receives >= self._options.empty_receives_tolerance
+
+    def wait_time(self, time_left: float) -> int:
+
+        mode = self._options.mode
+        if mode == PollingMode.short:
+            wait_time = 0
+        elif mode == PollingMode.long:
+            wait_time = self._options.max_wait_time
+        elif self._hit_rate < self._options.hit_rate_threshold:
+            wait_time = self._options.max_wait_time
+        else:
+            wait_time = 0
+
+        # Do not wait for messages after receiving deadline
+        return max(0, min(wait_time, int(time_left)))
+
+    def update(self, num_received: int, wait_time: int = 0):
+
+        """Accounts response to receive call made with `wait_time`"""
+
+        hit = 1.0 if num_received > 0 else 0.0
+        weight = self._options.hit_rate_smoothing
+        self._hit_rate = weight * hit + (1 - weight) * self._hit_rate
+
+        if num_received > 0:
+            self._empty_receives = 0
+        elif wait_time > 0:
+            self._empty_receives = self._options.empty_receives_tolerance
+        else:
+            self._empty_receives += 1
+
+
+class ReceiveEngine(str, Enum):
+    threads = "threads"
+    asyncio = "asyncio"
 
 
 @dataclass
-class Credentials:
-    access_key: int
-    secret_key: int
-    region_name: str
-    endpoint_url: Optional[str]
+class BufferLimits:
+
+    max_messages: int = 10000
+    """Pause receiving when N messages are waiting for consumer"""
+
+    max_bytes: int = 64 * 1024 * 1024
+    """Pause receiving when message bodies and attributes take N bytes"""
+
+
+class MessageBuffer:
+
+    """Bounded buffer between receiver workers and consumer.
+
+    Workers call `wait_for_space` before each receive request, so when
+    consumer falls behind they stop pulling messages instead of growing
+    memory, and buffered messages do not use up their visibility timeout
+    while they wait. Limits are soft: a worker that was let in may add
+    one more batch on top of them.
+    """
+
+    _cond: Condition
+    _batches: Deque[Tuple[Optional[List[Message]], int]]
+    _limits: BufferLimits
+    _num_messages: int
+    _num_bytes: int
+    _closed: bool
+    _listeners: List[Callable[[], None]]
+
+    def __init__(self, limits: BufferLimits):
+
+        if limits.max_messages <= 0 or limits.max_bytes <= 0:
+            raise ValueError("Buffer limits must be greater than 0")
+
+        self._cond = Condition()
+        self._batches = deque()
+        self._limits = limits
+        self._num_messages = 0
+        self._num_bytes = 0
+        self._closed = False
+        self._listeners = list()
+
+    def add_listener(self, listener: Callable[[], None]):
+
+        """Calls listener whenever space is freed or buffer is closed,
+        so producers which can't block (e.g. coroutines) may re-check
+        `has_space`. Listener is called under the buffer lock"""
+
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        with self._cond:
+            self._listeners.remove(listener)
+
+    def _notify_producers(self):
+        for listener in self._listeners:
+            listener()
+
+    @staticmethod
+    def _message_size(message: Message) -> int:
+
+        """Returns size of message body and attributes in UTF-8 bytes"""
+
+        size = len(message.body.encode())
+        for name, data in (message.attributes or {}).items():
+            size += len(name.encode())
+            if "StringValue" in data:
+                size += len(data["StringValue"].encode())
+            if "BinaryValue" in data:
+                size += len(data["BinaryValue"])
+
+        return size
+
+    @classmethod
+    def _batch_size(cls, batch: List[Message]) -> int:
+        return sum(cls._message_size(message) for message in batch)
+
+    def _has_space(self) -> bool:
+        return (
+            self._num_messages < self._limits.max_messages
+            and self._num_bytes < self._limits.max_bytes
+        )
+
+    def has_space(self) -> bool:
+        with self._cond:
+            return self._closed or self._has_space()
+
+    def wait_for_space(self, timeout: Optional[float] = None) -> bool:
+
+        """Blocks until buffer has free space. Returns False if
+        timeout expired or buffer was closed for producers"""
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._has_space(), timeout)
+            return not self._closed and self._has_space()
+
+    def put(self, batch: Optional[List[Message]]):
+
+        """Adds batch of messages, None marks end of messages"""
+
+        # Size is counted once, outside of the lock
+        size = self._batch_size(batch) if batch is not None else 0
+
+        with self._cond:
+            if batch is not None:
+                self._num_messages += len(batch)
+                self._num_bytes += size
+
+            self._batches.append((batch, size))
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[List[Message]]:
+
+        """Takes next batch of messages. Raises `Empty` on timeout"""
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._batches, timeout):
+                raise Empty()
+
+            batch, size = self._batches.popleft()
+            if batch is not None:
+                self._num_messages -= len(batch)
+                self._num_bytes -= size
+
+            self._cond.notify_all()
+            self._notify_producers()
+            return batch
+
+    def close(self):
+
+        """Wakes up producers and makes them stop waiting for space.
+        Consumer still gets all buffered batches"""
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._notify_producers()
 
 
 class SQSMessageIterator:
 
     _lock: Lock
+    _started: bool
     _shutdown: bool
+    _client: SQSClient
     _queue_name: str
-    _unique_messages: Queue
-    _unique_message_ids: set
+    _queue_url: Optional[str]
+    _unique_messages: MessageBuffer
+    _pending_messages: Deque[Message]
+    _unique_message_ids: MessageIdIndex
+    _num_received: int
     _conditions: ReceiveConditions
+    _polling: PollingOptions
+    _deadline: float
     _worker_threads: List[Thread]
+    _workers_done: Event
+    _num_active_workers: int
     _checker_thread: Thread
+    _num_workers: int
+    _scheduler: Optional[ReceiveScheduler]
+    _priority: float
+    _receive_id: Optional[int]
     _max_num_of_msgs = 10
-    _service_name = "sqs"
 
     def __init__(
         self,
@@ -81,7 +330,11 @@ class SQSMessageIterator:
         credentials: Credentials,
         conditions: ReceiveConditions,
         num_workers: Optional[int] = None,
-        msg_ids_exclude = set(),
+        msg_ids_exclude: Optional[Iterable[str]] = None,
+        polling: Optional[PollingOptions] = None,
+        buffer_limits: Optional[BufferLimits] = None,
+        scheduler: Optional[ReceiveScheduler] = None,
+        priority: float = 1.0,
     ):
         if num_workers is None:
             num_workers = os.cpu_count() or 2
@@ -89,19 +342,57 @@ class SQSMessageIterator:
         if num_workers <= 0:
             raise ValueError("num_workers must be greater than 0")
 
+        # More workers than the global budget would only wait for slots
+        if scheduler is not None:
+            num_workers = min(num_workers, scheduler.budget)
+
+        max_requests = self._max_concurrent_requests()
+        if max_requests is not None:
+            num_workers = min(num_workers, max_requests)
+
         self._lock = Lock()
+        self._started = False
         self._shutdown = False
         self._worker_threads = list()
-        self._unique_messages = Queue()
-        self._unique_message_ids = msg_ids_exclude
-        self._checker_thread = Thread(target=self.checker_thread)
+        self._workers_done = Event()
+        self._num_active_workers = 0
+        self._unique_messages = MessageBuffer(buffer_limits or BufferLimits())
+        self._pending_messages = deque()
+        self._unique_message_ids = self._create_id_index(msg_ids_exclude)
+        self._num_received = 0
+        self._num_workers = num_workers
         self._conditions = conditions
+        self._polling = polling or PollingOptions()
+        self._deadline = monotonic() + conditions.timeout
         self._queue_name = queue_name
+        self._queue_url = None
+        self._scheduler = scheduler
+        self._priority = priority
+        self._receive_id = None
 
-        for _ in range(num_workers):
-            session = self._create_session(credentials)
-            thread = Thread(target=self.worker_thread, args=(session,))
-            self._worker_threads.append(thread)
+        # Workers share one pooled, thread safe client
+        self._client = get_client(credentials)
+
+    @staticmethod
+    def _max_concurrent_requests() -> Optional[int]:
+
+        # Workers share one client, requests above
+        # its pool size would not reuse connections
+        return get_max_pool_connections()
+
+    @staticmethod
+    def _create_id_index(msg_ids: Optional[Iterable[str]]) -> MessageIdIndex:
+
+        # Index passed by caller is updated in place,
+        # so it can be saved and reused for next dump
+        if isinstance(msg_ids, MessageIdIndex):
+            return msg_ids
+
+        return MessageIdIndex(msg_ids or ())
+
+    @property
+    def message_ids(self) -> MessageIdIndex:
+        return self._unique_message_ids
 
     def __iter__(self):
         self.start_message_receiving()
@@ -109,36 +400,208 @@ class SQSMessageIterator:
 
     def __next__(self):
 
-        message = self._unique_messages.get()
-        if message is not None:
-            return message
+        if not self._pending_messages:
+            messages = self._unique_messages.get()
+            if messages is None:
+                self._checker_thread.join()
+                raise StopIteration()
+
+            self._pending_messages.extend(messages)
+
+        return self._pending_messages.popleft()
+
+    def iter_batches(
+        self,
+        max_size: int = 1000,
+        max_latency: float = 0.1,
+    ) -> Iterator[List[Message]]:
+
+        """Receives messages and yields them in lists.
+
+        A list is yielded when it has `max_size` messages or when
+        `max_latency` seconds have passed since its first message
+        was taken, whatever comes first.
+        """
+
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+
+        self.start_message_receiving()
+
+        finished = False
+        batch: List[Message] = []
+
+        while not finished:
+
+            # Wait for the first messages of a batch
+            messages = self._unique_messages.get()
+            if messages is None:
+                break
+
+            batch.extend(messages)
+            deadline = monotonic() + max_latency
+
+            # Take more messages until batch is full or latency expires
+            while len(batch) < max_size:
+
+                time_left = deadline - monotonic()
+                if time_left <= 0:
+                    break
+
+                try:
+                    messages = self._unique_messages.get(timeout=time_left)
+                except Empty:
+                    break
+
+                if messages is None:
+                    finished = True
+                    break
+
+                batch.extend(messages)
+
+            while len(batch) >= max_size:
+                yield batch[:max_size]
+                batch = batch[max_size:]
+
+            if batch:
+                yield batch
+                batch = []
 
         self._checker_thread.join()
-        raise StopIteration()
 
     def start_message_receiving(self):
 
-        for thread in self._worker_threads:
+        # Iterator may be passed to iter() several times
+        if self._started:
+            return
+
+        self._started = True
+        resp = self._client.get_queue_url(QueueName=self._queue_name)
+        self._queue_url = resp["QueueUrl"]
+
+        if self._scheduler is not None:
+            self._receive_id = self._scheduler.register(self._priority)
+
+        self._deadline = monotonic() + self._conditions.timeout
+        self._start_workers()
+
+    def _acquire_slot(self, timeout: Optional[float]) -> bool:
+
+        if self._scheduler is None:
+            return True
+
+        return self._scheduler.acquire(self._receive_id, timeout)
+
+    def _release_slot(self):
+        if self._scheduler is not None:
+            self._scheduler.release(self._receive_id)
+
+    def _unregister(self):
+        if self._scheduler is not None:
+            self._scheduler.unregister(self._receive_id)
+
+    def _cancel_slots(self):
+        if self._scheduler is not None and self._receive_id is not None:
+            self._scheduler.cancel(self._receive_id)
+
+    def _start_workers(self):
+
+        self._num_active_workers = self._num_workers
+        for _ in range(self._num_workers):
+            thread = Thread(target=self._run_worker_thread)
+            self._worker_threads.append(thread)
             thread.start()
 
+        self._checker_thread = Thread(target=self.checker_thread)
         self._checker_thread.start()
 
-    def _create_session(self, credentials: Credentials):
-        return boto3.Session().resource(
-            service_name=self._service_name,
-            region_name=credentials.region_name,
-            aws_access_key_id=credentials.access_key,
-            aws_secret_access_key=credentials.secret_key,
-            endpoint_url=credentials.endpoint_url,
+    def _receive_params(self, poller: AdaptivePoller):
+
+        # Each received message will be
+        # invisible for `timeout` seconds
+        return dict(
+            QueueUrl=self._queue_url,
+            MaxNumberOfMessages=self._max_num_of_msgs,
+            VisibilityTimeout=self._conditions.timeout,
+            MessageAttributeNames=["All"],
+            AttributeNames=["All"],
+            WaitTimeSeconds=poller.wait_time(self._deadline - monotonic()),
+        )
+
+    @staticmethod
+    def _create_message(message: SQSMessage) -> Message:
+        return Message(
+            id=message["MessageId"],
+            body=message["Body"],
+            md5OfBody=message["MD5OfBody"],
+            attributes=message.get("MessageAttributes"),
+            md5OfAttributes=message.get("MD5OfMessageAttributes"),
+            sysAttributes=message.get("Attributes", {}),
+            receiptHandle=message["ReceiptHandle"],
         )
 
-    def worker_thread(self, sqs: SQSServiceResource):
+    def _process_messages(self, messages: List[SQSMessage]) -> bool:
+
+        """Puts unique messages into queue. Returns True when receiving is done"""
+
+        unique_messages: List[SQSMessage] = []
+
+        # Only the dedup check runs under the lock,
+        # which is a few set operations per batch
+        with self._lock:
+
+            for message in messages:
+
+                # Skip already received message
+                message_id = message["MessageId"]
+                if message_id in self._unique_message_ids:
+                    continue
+
+                self._unique_message_ids.add(message_id)
+                unique_messages.append(message)
+
+            self._num_received += len(unique_messages)
+            num_received = self._num_received
+
+        # Message validation is CPU work, so workers do it
+        # in parallel, outside of the lock. Messages are queued
+        # by batches to keep per-message overhead low
+        if unique_messages:
+            self._unique_messages.put(
+                [self._create_message(message) for message in unique_messages]
+            )
+
+        # First N messages have been received -> exit
+        # `Count` condition is fulfilled
+        if not self._conditions.all:
+            if num_received >= self._conditions.count:
+                self._stop_workers()
+                return True
+
+        return False
+
+    def _stop_workers(self):
+
+        # Wake up workers waiting for buffer space or a slot
+        self._shutdown = True
+        self._unique_messages.close()
+        self._cancel_slots()
+
+    def _run_worker_thread(self):
+
+        try:
+            self.worker_thread()
+        finally:
+            with self._lock:
+                self._num_active_workers -= 1
+                if self._num_active_workers == 0:
+                    self._workers_done.set()
+
+    def worker_thread(self):
 
         """This thread receives messages and puts unique ones into queue"""
 
-        queue: SQSQueue = sqs.get_queue_by_name(
-            QueueName=self._queue_name,
-        )
+        poller = AdaptivePoller(self._polling)
 
         while True:
 
@@ -147,98 +610,332 @@ class SQSMessageIterator:
             if self._shutdown:
                 return
 
-            # Receive messages from queue
-            # Each received message will be
-            # invisible for `timeout` seconds
-            messages = queue.receive_messages(
-                MaxNumberOfMessages=self._max_num_of_msgs,
-                VisibilityTimeout=self._conditions.timeout,
-                MessageAttributeNames=["All"],
-                AttributeNames=["All"],
-                WaitTimeSeconds=0,
-            )
+            # Consumer falls behind -> pause receiving
+            # until buffer has space or `Timeout` expires
+            if not self._unique_messages.wait_for_space(self._deadline - monotonic()):
+                return
 
-            # No messages left in queue -> exit
-            # `All` condition is fulfilled
-            if not messages:
+            # Wait for a slot in the global budget of requests
+            if not self._acquire_slot(self._deadline - monotonic()):
                 return
 
-            with self._lock:
+            # Receiving may have stopped while worker waited, another
+            # request would hide messages from other consumers
+            if self._shutdown:
+                self._release_slot()
+                return
 
-                for message in messages:
+            # Receive messages from queue
+            params = self._receive_params(poller)
+            try:
+                resp = self._client.receive_message(**params)
+            finally:
+                self._release_slot()
 
-                    # Skip already received message
-                    if message.message_id in self._unique_message_ids:
-                        continue
+            messages: List[SQSMessage] = resp.get("Messages", [])
 
-                    # Save received message
-                    saved_msg = Message(
-                        id=message.message_id,
-                        body=message.body,
-                        md5OfBody=message.md5_of_body,
-                        attributes=message.message_attributes,
-                        md5OfAttributes=message.md5_of_message_attributes,
-                        sysAttributes=message.attributes,
-                        receiptHandle=message.receipt_handle,
-                    )
+            # Queue is drained -> exit
+            # `All` condition is fulfilled
+            poller.update(len(messages), params["WaitTimeSeconds"])
+            if poller.exhausted:
+                return
 
-                    self._unique_message_ids.add(saved_msg.id)
-                    self._unique_messages.put(saved_msg)
+            if not messages:
+                continue
 
-                # First N messages have been received -> exit
-                # `Count` condition is fulfilled
-                if not self._conditions.all:
-                    if len(self._unique_message_ids) >= self._conditions.count:
-                        return
+            if self._process_messages(messages):
+                return
 
     def checker_thread(self):
 
-        """This thread waits until all worker threads finish"""
+        """This thread waits until all worker threads
+        finish or `Timeout` expires, whatever comes first"""
 
-        interval = 0.5
-        iters = round(self._conditions.timeout / interval)
+        self._workers_done.wait(max(0, self._deadline - monotonic()))
 
-        for _ in range(iters):
-            sleep(interval)
-            if all(not th.is_alive() for th in self._worker_threads):
-                break
-
-        self._shutdown = True
+        self._stop_workers()
         for thread in self._worker_threads:
             thread.join()
 
+        self._unregister()
+
         self._unique_messages.put(None)
 
 
+class _ExecutorClient:
+
+    """Async facade over the pooled boto3 client.
+
+    Used when aiobotocore is not installed. Requests still block
+    executor threads, but the receive loop itself stays the same.
+    """
+
+    _client: SQSClient
+    _executor: ThreadPoolExecutor
+
+    def __init__(self, client: SQSClient, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._executor.shutdown(wait=False)
+
+    async def receive_message(self, **kwargs):
+        loop = asyncio.get_running_loop()
+        func = partial(self._client.receive_message, **kwargs)
+        return await loop.run_in_executor(self._executor, func)
+
+
+class AsyncSQSMessageIterator(SQSMessageIterator):
+
+    """Receives messages with coroutines in a single event loop thread.
+
+    Instead of an OS thread per worker, each worker is a coroutine,
+    so hundreds of `ReceiveMessage` calls can be in flight at once.
+    Uses aiobotocore when it is installed, otherwise falls back to
+    running the pooled boto3 client in a thread pool executor.
+    """
+
+    _credentials: Credentials
+    _default_num_workers = 64
+
+    def __init__(
+        self,
+        queue_name: str,
+        credentials: Credentials,
+        conditions: ReceiveConditions,
+        num_workers: Optional[int] = None,
+        msg_ids_exclude: Optional[Iterable[str]] = None,
+        polling: Optional[PollingOptions] = None,
+        buffer_limits: Optional[BufferLimits] = None,
+        scheduler: Optional[ReceiveScheduler] = None,
+        priority: float = 1.0,
+    ):
+        if num_workers is None:
+            num_workers = self._default_num_workers
+
+        super().__init__(
+            queue_name,
+            credentials,
+            conditions,
+            num_workers,
+            msg_ids_exclude,
+            polling,
+            buffer_limits,
+            scheduler,
+            priority,
+        )
+
+        self._credentials = credentials
+
+    @staticmethod
+    def _max_concurrent_requests() -> Optional[int]:
+
+        # Client of aiobotocore gets its own pool, sized for all workers.
+        # Fallback runs requests with the shared client in a thread pool
+        if get_aio_session is None:
+            return get_max_pool_connections()
+
+        return None
+
+    def _start_workers(self):
+        self._checker_thread = Thread(target=self.event_loop_thread)
+        self._checker_thread.start()
+
+    def _create_async_client(self):
+
+        if get_aio_session is None:
+            return _ExecutorClient(self._client, self._num_workers)
+
+        return get_aio_session().create_client(
+            service_name=SERVICE_NAME,
+            region_name=self._credentials.region_name,
+            aws_access_key_id=self._credentials.access_key,
+            aws_secret_access_key=self._credentials.secret_key,
+            endpoint_url=self._credentials.endpoint_url,
+            config=AioConfig(max_pool_connections=self._num_workers),
+        )
+
+    async def _wait_until(
+        self,
+        wakeup: asyncio.Event,
+        ready: Callable[[], bool],
+    ) -> bool:
+
+        """Waits until ready() returns True without blocking other
+        coroutines. Returns False on shutdown or when `Timeout` expires"""
+
+        while True:
+
+            # Cleared before the check, so a wakeup
+            # coming after it is not missed
+            wakeup.clear()
+            if self._shutdown:
+                return False
+
+            if ready():
+                return True
+
+            time_left = self._deadline - monotonic()
+            if time_left <= 0:
+                return False
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), time_left)
+            except asyncio.TimeoutError:
+                return False
+
+    async def _acquire_slot_async(self, wakeup: asyncio.Event) -> bool:
+
+        if self._scheduler is None:
+            return not self._shutdown
+
+        # Scheduler gives free slots to receives behind their
+        # share, so it has to know this one is waiting too
+        self._scheduler.begin_wait(self._receive_id)
+        try:
+            return await self._wait_until(wakeup, partial(self._acquire_slot, 0))
+        finally:
+            self._scheduler.end_wait(self._receive_id)
+
+    async def worker_coroutine(self, client, wakeup: asyncio.Event):
+
+        """This coroutine receives messages and puts unique ones into queue.
+        Buffer and scheduler set `wakeup` when it may continue"""
+
+        poller = AdaptivePoller(self._polling)
+
+        while not self._shutdown:
+
+            # Consumer falls behind -> pause receiving
+            # without blocking other coroutines
+            if not await self._wait_until(wakeup, self._unique_messages.has_space):
+                return
+
+            # Same for a slot in the global budget of requests
+            if not await self._acquire_slot_async(wakeup):
+                return
+
+            if self._shutdown:
+                self._release_slot()
+                return
+
+            params = self._receive_params(poller)
+            try:
+                resp = await client.receive_message(**params)
+            finally:
+                self._release_slot()
+
+            messages: List[SQSMessage] = resp.get("Messages", [])
+
+            poller.update(len(messages), params["WaitTimeSeconds"])
+            if poller.exhausted:
+                return
+
+            if messages and self._process_messages(messages):
+                return
+
+    async def receive_all(self):
+
+        # Buffer and scheduler notify from other threads
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        wake = partial(loop.call_soon_threadsafe, wakeup.set)
+
+        self._unique_messages.add_listener(wake)
+        if self._scheduler is not None:
+            self._scheduler.add_listener(wake)
+
+        try:
+            async with self._create_async_client() as client:
+
+                workers = [
+                    asyncio.ensure_future(self.worker_coroutine(client, wakeup))
+                    for _ in range(self._num_workers)
+                ]
+
+                # Wait until all workers finish or `Timeout` expires
+                time_left = max(0, self._deadline - monotonic())
+                _, pending = await asyncio.wait(workers, timeout=time_left)
+
+                self._stop_workers()
+                for task in pending:
+                    task.cancel()
+
+                results = await asyncio.gather(*workers, return_exceptions=True)
+
+        finally:
+            self._unique_messages.remove_listener(wake)
+            if self._scheduler is not None:
+                self._scheduler.remove_listener(wake)
+
+        self._unregister()
+
+        # Failed request must not pass for an empty queue
+        errors = [
+            result
+            for result in results
+            if isinstance(result, Exception)
+            and not isinstance(result, asyncio.CancelledError)
+        ]
+
+        for error in errors:
+            _logger.error("Receive worker failed", exc_info=error)
+
+        if errors:
+            raise errors[0]
+
+    def event_loop_thread(self):
+
+        """This thread runs worker coroutines until receiving is done"""
+
+        try:
+            asyncio.run(self.receive_all())
+        finally:
+            self._unique_messages.put(None)
+
+
 def receiveMessages(
     queue_name: str,
     credentials: Credentials,
     conditions: ReceiveConditions,
     num_workers: Optional[int] = None,
-    msg_ids_exclude = set(),
-) -> Iterator[Message]:
-
-    return SQSMessageIterator(
+    msg_ids_exclude: Optional[Iterable[str]] = None,
+    polling: Optional[PollingOptions] = None,
+    engine: ReceiveEngine = ReceiveEngine.threads,
+    buffer_limits: Optional[BufferLimits] = None,
+    scheduler: Optional[ReceiveScheduler] = None,
+    priority: float = 1.0,
+) -> SQSMessageIterator:
+
+    if engine == ReceiveEngine.asyncio:
+        iterator_class = AsyncSQSMessageIterator
+    else:
+        iterator_class = SQSMessageIterator
+
+    return iterator_class(
         queue_name,
         credentials,
         conditions,
         num_workers,
         msg_ids_exclude,
+        polling,
+        buffer_limits,
+        scheduler,
+        priority,
     )
 
 
 def sendMessages(queue_name: str, n: int, credentials: Credentials):
 
-    session = boto3.Session()
-    sqs: SQSServiceResource = session.resource(
-        service_name="sqs",
-        region_name=credentials.region_name,
-        aws_access_key_id=credentials.access_key,
-        aws_secret_access_key=credentials.secret_key,
-        endpoint_url=credentials.endpoint_url,
-    )
-
-    queue: SQSQueue = sqs.get_queue_by_name(QueueName=queue_name)
+    client = get_client(credentials)
+    queue_url = client.get_queue_url(QueueName=queue_name)["QueueUrl"]
 
     for i in range(n):
-        queue.send_message(MessageBody=f"message-{i}-{random_string(10)}")
+        client.send_message(
+            QueueUrl=queue_url,
+            MessageBody=f"message-{i}-{random_string(10)}",
+        )
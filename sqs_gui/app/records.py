@@ -0,0 +1,299 @@
+from base64 import b85decode, b85encode
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import struct
+
+from .message import LazyValue, Message
+
+try:
+    import ujson as json  # type: ignore
+except ModuleNotFoundError:
+    import json
+
+
+RECORD_V2 = 2
+
+Buffer = Union[bytes, memoryview]
+
+# Every record starts with its version, so records of
+# different versions can be stored in the same log
+
+# V2: version, flags, SentTimestamp, lengths of message ID, body, MD5 of
+# body, MD5 of attributes and receipt handle, numbers of attributes and
+# system attributes. Fields follow in that order, then attributes
+_V2_HEADER = struct.Struct("<BBqHIBBHHH")
+
+_HAS_ATTRIBUTES = 0x01
+_HAS_MD5_OF_ATTRIBUTES = 0x02
+
+# Lengths of name, data type and value, kind of value
+_ATTRIBUTE = struct.Struct("<HHIB")
+# Lengths of name and value
+_SYS_ATTRIBUTE = struct.Struct("<HI")
+
+_STRING_VALUE = 0
+_BINARY_VALUE = 1
+_JSON_VALUE = 2
+"""Any other attribute contents (e.g. list values) as JSON"""
+
+
+def encodeAttributes(attributes: Optional[dict]) -> Optional[dict]:
+
+    """Makes copy of message attributes with binary values
+    b85-encoded, so they can be stored as JSON"""
+
+    if attributes is None:
+        return None
+
+    encoded = {}
+    for name, data in attributes.items():
+        if "BinaryValue" in data:
+            data = dict(data, BinaryValue=b85encode(data["BinaryValue"]).decode())
+        encoded[name] = data
+
+    return encoded
+
+
+def decodeAttributes(attributes: Optional[dict]) -> Optional[dict]:
+
+    """Decodes binary values of attributes stored as JSON back into bytes"""
+
+    if attributes is not None:
+        for data in attributes.values():
+            if "BinaryValue" in data:
+                data["BinaryValue"] = b85decode(data["BinaryValue"])
+
+    return attributes
+
+
+def lazyAttributes(attributes: Optional[dict]) -> Optional[LazyValue]:
+
+    """Defers decoding of binary values of attributes stored as
+    JSON, they are decoded only if somebody needs them"""
+
+    if attributes is None:
+        return None
+
+    return LazyValue(partial(decodeAttributes, attributes))
+
+
+class RecordHead(NamedTuple):
+
+    sentTimestamp: int
+    idStart: int
+    idEnd: int
+    bodyStart: int
+    bodyEnd: int
+
+
+def readHead(record: Buffer) -> RecordHead:
+
+    """Decodes SentTimestamp and positions of message ID and body"""
+
+    version = record[0]
+    if version != RECORD_V2:
+        raise ValueError(f"Unsupported record version: {version}")
+
+    header = _V2_HEADER.unpack_from(record)
+    sentTimestamp, idLength, bodyLength = header[2:5]
+    idStart = _V2_HEADER.size
+
+    bodyStart = idStart + idLength
+    return RecordHead(
+        sentTimestamp,
+        idStart,
+        bodyStart,
+        bodyStart,
+        bodyStart + bodyLength,
+    )
+
+
+def _encodeAttributesV2(attributes: Dict[str, dict], chunks: List[bytes]):
+
+    for name, data in attributes.items():
+
+        dataType = data["DataType"]
+        if set(data) == {"DataType", "StringValue"}:
+            kind, value = _STRING_VALUE, data["StringValue"].encode()
+        elif set(data) == {"DataType", "BinaryValue"}:
+            kind, value = _BINARY_VALUE, bytes(data["BinaryValue"])
+        else:
+            kind = _JSON_VALUE
+            value = json.dumps(encodeAttributes({name: data})[name]).encode()
+
+        nameBytes = name.encode()
+        dataTypeBytes = dataType.encode()
+        chunks.append(
+            _ATTRIBUTE.pack(len(nameBytes), len(dataTypeBytes), len(value), kind)
+        )
+        chunks.extend((nameBytes, dataTypeBytes, value))
+
+
+def _decodeAttributesV2(data: bytes, count: int) -> Dict[str, dict]:
+
+    attributes = {}
+    offset = 0
+
+    for _ in range(count):
+        nameLength, dataTypeLength, valueLength, kind = _ATTRIBUTE.unpack_from(
+            data, offset
+        )
+
+        offset += _ATTRIBUTE.size
+        name = data[offset : offset + nameLength].decode()
+        offset += nameLength
+        dataType = data[offset : offset + dataTypeLength].decode()
+        offset += dataTypeLength
+        value = data[offset : offset + valueLength]
+        offset += valueLength
+
+        if kind == _STRING_VALUE:
+            attributes[name] = {"DataType": dataType, "StringValue": value.decode()}
+        elif kind == _BINARY_VALUE:
+            attributes[name] = {"DataType": dataType, "BinaryValue": value}
+        else:
+            attributes[name] = decodeAttributes({name: json.loads(value)})[name]
+
+    return attributes
+
+
+def encodeRecord(message: Message) -> bytes:
+
+    """Encodes message as V2 record: binary header with field lengths and
+    raw fields, binary attribute values are stored as they are"""
+
+    messageId = message.id.encode()
+    body = message.body.encode()
+    md5OfBody = message.md5OfBody.encode()
+    md5OfAttributes = (message.md5OfAttributes or "").encode()
+    receiptHandle = message.receiptHandle.encode()
+    attributes = message.attributes
+    sysAttributes = message.sysAttributes
+
+    flags = 0
+    if attributes is not None:
+        flags |= _HAS_ATTRIBUTES
+    if message.md5OfAttributes is not None:
+        flags |= _HAS_MD5_OF_ATTRIBUTES
+
+    header = _V2_HEADER.pack(
+        RECORD_V2,
+        flags,
+        int(sysAttributes.get("SentTimestamp", 0)),
+        len(messageId),
+        len(body),
+        len(md5OfBody),
+        len(md5OfAttributes),
+        len(receiptHandle),
+        len(attributes or ()),
+        len(sysAttributes),
+    )
+
+    chunks = [header, messageId, body, md5OfBody, md5OfAttributes, receiptHandle]
+
+    for name, value in sysAttributes.items():
+        nameBytes = name.encode()
+        valueBytes = value.encode()
+        chunks.append(_SYS_ATTRIBUTE.pack(len(nameBytes), len(valueBytes)))
+        chunks.extend((nameBytes, valueBytes))
+
+    if attributes:
+        _encodeAttributesV2(attributes, chunks)
+
+    return b"".join(chunks)
+
+
+def _decodeRecordV2(record: Buffer) -> Message:
+
+    (
+        _,
+        flags,
+        _,
+        idLength,
+        bodyLength,
+        md5OfBodyLength,
+        md5OfAttributesLength,
+        receiptHandleLength,
+        numAttributes,
+        numSysAttributes,
+    ) = _V2_HEADER.unpack_from(record)
+
+    offset = _V2_HEADER.size
+    fields: List[str] = []
+    for length in (
+        idLength,
+        bodyLength,
+        md5OfBodyLength,
+        md5OfAttributesLength,
+        receiptHandleLength,
+    ):
+        fields.append(str(record[offset : offset + length], "utf-8"))
+        offset += length
+
+    messageId, body, md5OfBody, md5OfAttributes, receiptHandle = fields
+
+    sysAttributes = {}
+    for _ in range(numSysAttributes):
+        nameLength, valueLength = _SYS_ATTRIBUTE.unpack_from(record, offset)
+        offset += _SYS_ATTRIBUTE.size
+        name = str(record[offset : offset + nameLength], "utf-8")
+        offset += nameLength
+        sysAttributes[name] = str(record[offset : offset + valueLength], "utf-8")
+        offset += valueLength
+
+    # Attributes are decoded only if somebody needs them
+    attributes: Union[None, dict, LazyValue] = None
+    if flags & _HAS_ATTRIBUTES:
+        attributes = {}
+        if numAttributes:
+            data = bytes(record[offset:])
+            attributes = LazyValue(partial(_decodeAttributesV2, data, numAttributes))
+
+    return Message(
+        id=messageId,
+        body=body,
+        md5OfBody=md5OfBody,
+        attributes=attributes,  # type: ignore
+        md5OfAttributes=md5OfAttributes if flags & _HAS_MD5_OF_ATTRIBUTES else None,
+        sysAttributes=sysAttributes,
+        receiptHandle=receiptHandle,
+    )
+
+
+def decodeRecord(record: Buffer) -> Message:
+
+    """Decodes record, raises ValueError if its version is unsupported"""
+
+    version = record[0]
+    if version != RECORD_V2:
+        raise ValueError(f"Unsupported record version: {version}")
+
+    return _decodeRecordV2(record)
+
+
+def decodeRecordId(record: Buffer) -> str:
+    head = readHead(record)
+    return str(record[head.idStart : head.idEnd], "utf-8")
+
+
+def recordBody(record: Buffer) -> Buffer:
+
+    """Returns UTF-8 encoded body, a slice of record"""
+
+    head = readHead(record)
+    return record[head.bodyStart : head.bodyEnd]
+
+
+def recordSummary(record: Buffer, previewLength: int) -> Tuple[str, int, str]:
+
+    """Decodes message ID, SentTimestamp and beginning of body only"""
+
+    head = readHead(record)
+    messageId = str(record[head.idStart : head.idEnd], "utf-8")
+
+    # UTF-8 character takes at most 4 bytes. Character
+    # cut at the end of the slice is dropped
+    end = head.bodyStart + min(head.bodyEnd - head.bodyStart, 4 * previewLength)
+    preview = str(record[head.bodyStart : end], "utf-8", "ignore")[:previewLength]
+
+    return messageId, head.sentTimestamp, preview
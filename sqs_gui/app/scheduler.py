@@ -0,0 +1,163 @@
+from itertools import count
+from threading import Condition
+from typing import Callable, Dict, Iterator, List, Optional, Set
+import os
+
+
+class ReceiveScheduler:
+
+    """Shares a global budget of concurrent receive requests between queues.
+
+    Every receive registers with a priority and must acquire a slot before
+    each `ReceiveMessage` call. When slots are scarce, the next free slot
+    goes to the waiting receive with the lowest number of requests in
+    flight per unit of priority, so several dumps running at once get a
+    fair (weighted) share and never exceed the budget together.
+    """
+
+    _cond: Condition
+    _budget: int
+    _total_in_flight: int
+    _in_flight: Dict[int, int]
+    _waiting: Dict[int, int]
+    _priorities: Dict[int, float]
+    _cancelled: Set[int]
+    _listeners: List[Callable[[], None]]
+    _ids: Iterator[int]
+
+    def __init__(self, budget: Optional[int] = None):
+
+        if budget is None:
+            budget = 2 * (os.cpu_count() or 2)
+
+        if budget <= 0:
+            raise ValueError("budget must be greater than 0")
+
+        self._cond = Condition()
+        self._budget = budget
+        self._total_in_flight = 0
+        self._in_flight = dict()
+        self._waiting = dict()
+        self._priorities = dict()
+        self._cancelled = set()
+        self._listeners = list()
+        self._ids = count()
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    def add_listener(self, listener: Callable[[], None]):
+
+        """Calls listener whenever a slot may have become free, so
+        waiters which can't block (e.g. coroutines) may retry
+        `acquire`. Listener is called under the scheduler lock"""
+
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[], None]):
+        with self._cond:
+            self._listeners.remove(listener)
+
+    def _notify(self):
+
+        self._cond.notify_all()
+        for listener in self._listeners:
+            listener()
+
+    def begin_wait(self, receive_id: int):
+
+        """Counts receive as waiting for a slot while it retries
+        `acquire` without blocking, see `add_listener`"""
+
+        with self._cond:
+            self._waiting[receive_id] += 1
+
+    def end_wait(self, receive_id: int):
+        with self._cond:
+            self._waiting[receive_id] -= 1
+            self._notify()
+
+    def register(self, priority: float = 1.0) -> int:
+
+        if priority <= 0:
+            raise ValueError("priority must be greater than 0")
+
+        with self._cond:
+            receive_id = next(self._ids)
+            self._in_flight[receive_id] = 0
+            self._waiting[receive_id] = 0
+            self._priorities[receive_id] = priority
+            return receive_id
+
+    def unregister(self, receive_id: int):
+
+        with self._cond:
+            self._total_in_flight -= self._in_flight.pop(receive_id)
+            del self._waiting[receive_id]
+            del self._priorities[receive_id]
+            self._cancelled.discard(receive_id)
+            self._notify()
+
+    def cancel(self, receive_id: int):
+
+        """Makes pending and further `acquire` calls of
+        receive return False without taking a slot"""
+
+        with self._cond:
+            self._cancelled.add(receive_id)
+            self._notify()
+
+    def _share(self, receive_id: int) -> float:
+        return self._in_flight[receive_id] / self._priorities[receive_id]
+
+    def _can_acquire(self, receive_id: int) -> bool:
+
+        if receive_id in self._cancelled:
+            return False
+
+        if self._total_in_flight >= self._budget:
+            return False
+
+        # Free slot goes to the receive that is most behind its share
+        shares = [
+            self._share(other_id)
+            for other_id, num_waiting in self._waiting.items()
+            if num_waiting > 0
+        ]
+
+        return self._share(receive_id) <= min(shares)
+
+    def acquire(self, receive_id: int, timeout: Optional[float] = None) -> bool:
+
+        """Waits for a free slot. Returns False on timeout
+        or when receive was cancelled"""
+
+        with self._cond:
+
+            self._waiting[receive_id] += 1
+            try:
+                self._cond.wait_for(
+                    lambda: receive_id in self._cancelled
+                    or self._can_acquire(receive_id),
+                    timeout,
+                )
+                acquired = self._can_acquire(receive_id)
+            finally:
+                self._waiting[receive_id] -= 1
+
+            if acquired:
+                self._in_flight[receive_id] += 1
+                self._total_in_flight += 1
+
+            # Shares have changed, let other waiters re-check them
+            self._notify()
+            return acquired
+
+    def release(self, receive_id: int):
+
+        with self._cond:
+            self._in_flight[receive_id] -= 1
+            self._total_in_flight -= 1
+            self._notify()
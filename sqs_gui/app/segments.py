@@ -0,0 +1,264 @@
+from array import array
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import mmap
+import os
+import re
+import struct
+import sys
+
+
+SEGMENT_MAGIC = b"SQSGSEG1"
+OFFSETS_MAGIC = b"SQSGOFF1"
+
+_LENGTH = struct.Struct("<I")
+_OFFSET = struct.Struct("<Q")
+_SEGMENT_NAME = re.compile(r"^segment-(\d{6})\.log$")
+
+
+def _segmentName(segmentId: int) -> str:
+    return f"segment-{segmentId:06d}.log"
+
+
+def _offsetsName(segmentId: int) -> str:
+    return f"segment-{segmentId:06d}.idx"
+
+
+class SegmentLog:
+
+    """Append-only log of records split into segment files.
+
+    Each segment is a sequence of records framed as 4-byte little-endian
+    length followed by record bytes. Next to each segment lives an offset
+    index: 8-byte offsets of its records, appended together with them.
+    When segment reaches `maxSegmentSize`, a new one is started, so a
+    dump of a million messages is a handful of files read sequentially.
+
+    Segments are read through memory maps: records are memoryviews into
+    the mapped file, so reading does not copy segments into the heap and
+    pages are shared with the OS cache.
+    """
+
+    _directory: str
+    _maxSegmentSize: int
+    _segment: Optional[BinaryIO]
+    _offsets: Optional[BinaryIO]
+    _segmentId: int
+    _segmentSize: int
+    _maps: Dict[int, memoryview]
+
+    def __init__(self, directory: str, maxSegmentSize: int = 64 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._maxSegmentSize = maxSegmentSize
+        self._segment = None
+        self._offsets = None
+        self._segmentId = 0
+        self._segmentSize = 0
+        self._maps = dict()
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def segmentIds(self) -> List[int]:
+
+        segmentIds = []
+        for filename in os.listdir(self._directory):
+            match = _SEGMENT_NAME.match(filename)
+            if match is not None:
+                segmentIds.append(int(match.group(1)))
+
+        return sorted(segmentIds)
+
+    def segmentPath(self, segmentId: int) -> str:
+        return os.path.join(self._directory, _segmentName(segmentId))
+
+    def offsetsPath(self, segmentId: int) -> str:
+        return os.path.join(self._directory, _offsetsName(segmentId))
+
+    # Writing
+
+    def _openSegment(self, segmentId: int):
+
+        segmentPath = self.segmentPath(segmentId)
+        offsetsPath = self.offsetsPath(segmentId)
+
+        if os.path.exists(segmentPath):
+            validSize, offsets = self._recover(segmentId)
+            # Mapping covers torn tail which is about to be cut
+            self._maps.pop(segmentId, None)
+            segment = open(segmentPath, "r+b")
+            segment.truncate(validSize)
+            segment.seek(validSize)
+        else:
+            validSize, offsets = len(SEGMENT_MAGIC), array("Q")
+            segment = open(segmentPath, "wb")
+            segment.write(SEGMENT_MAGIC)
+
+        # Offsets are rewritten to match recovered segment
+        with open(offsetsPath, "wb") as f:
+            f.write(OFFSETS_MAGIC)
+            self._writeOffsets(f, offsets)
+
+        self._segment = segment
+        self._offsets = open(offsetsPath, "ab")
+        self._segmentId = segmentId
+        self._segmentSize = validSize
+
+    def _recover(self, segmentId: int) -> Tuple[int, array]:
+
+        """Finds end of the last complete record of segment.
+        Tail of a record torn by crash is dropped"""
+
+        offsets = array("Q")
+        validSize = len(SEGMENT_MAGIC)
+
+        for offset, record in self.scanRecords(segmentId):
+            offsets.append(offset)
+            validSize = offset + _LENGTH.size + len(record)
+
+        return validSize, offsets
+
+    @staticmethod
+    def _writeOffsets(f: BinaryIO, offsets: array):
+
+        if sys.byteorder == "big":
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+
+        offsets.tofile(f)
+
+    def append(self, record: bytes):
+
+        if self._segment is None:
+            segmentIds = self.segmentIds()
+            self._openSegment(segmentIds[-1] if segmentIds else 1)
+
+        elif self._segmentSize >= self._maxSegmentSize:
+            self.close()
+            self._openSegment(self._segmentId + 1)
+
+        assert self._segment is not None
+        assert self._offsets is not None
+
+        self._segment.write(_LENGTH.pack(len(record)))
+        self._segment.write(record)
+        self._offsets.write(_OFFSET.pack(self._segmentSize))
+        self._segmentSize += _LENGTH.size + len(record)
+
+    def flush(self):
+
+        if self._segment is not None:
+            self._segment.flush()
+
+        if self._offsets is not None:
+            self._offsets.flush()
+
+    def sync(self):
+
+        """Flushes written records and waits until they reach disk"""
+
+        self.flush()
+        for f in (self._segment, self._offsets):
+            if f is not None:
+                os.fsync(f.fileno())
+
+    def close(self):
+
+        for f in (self._segment, self._offsets):
+            if f is not None:
+                f.close()
+
+        self._segment = None
+        self._offsets = None
+
+    # Reading
+
+    def mapSegment(self, segmentId: int, minSize: int = 0) -> memoryview:
+
+        """Maps segment file into memory. Mapping is cached and
+        is made again if it is shorter than minSize (segment grew).
+        Mapping is unmapped when the last view of it is released"""
+
+        data = self._maps.get(segmentId)
+        if data is not None and len(data) >= max(minSize, 1):
+            return data
+
+        with open(self.segmentPath(segmentId), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return memoryview(b"")
+            data = memoryview(mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+
+        self._maps[segmentId] = data
+        return data
+
+    def scanRecords(
+        self,
+        segmentId: int,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Iterator[Tuple[int, memoryview]]:
+
+        """Yields records of segment with their offsets. Records are views
+        into the mapped segment and are not copied. Scan can be limited to
+        records at offsets from start (must be a record offset) to end"""
+
+        size = os.path.getsize(self.segmentPath(segmentId))
+        data = self.mapSegment(segmentId, size)
+
+        if data[: len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+            raise ValueError(f"Not a segment file: {self.segmentPath(segmentId)}")
+
+        offset = len(SEGMENT_MAGIC) if start is None else start
+        end = len(data) if end is None else min(end, len(data))
+
+        while offset + _LENGTH.size <= end:
+
+            (length,) = _LENGTH.unpack_from(data, offset)
+            start = offset + _LENGTH.size
+            if start + length > len(data):
+                break
+
+            yield offset, data[start : start + length]
+            offset = start + length
+
+    def readRecords(self, segmentId: int) -> Iterator[memoryview]:
+        for _, record in self.scanRecords(segmentId):
+            yield record
+
+    def iterRecords(self) -> Iterator[memoryview]:
+        for segmentId in self.segmentIds():
+            yield from self.readRecords(segmentId)
+
+    def readOffsets(self, segmentId: int) -> array:
+
+        offsets = array("Q")
+        with open(self.offsetsPath(segmentId), "rb") as f:
+
+            if f.read(len(OFFSETS_MAGIC)) != OFFSETS_MAGIC:
+                raise ValueError(f"Not an offsets file: {self.offsetsPath(segmentId)}")
+
+            data = f.read()
+
+        # Ignore partially written tail entry
+        data = data[: len(data) - len(data) % offsets.itemsize]
+        offsets.frombytes(data)
+
+        if sys.byteorder == "big":
+            offsets.byteswap()
+
+        return offsets
+
+    def readRecord(self, segmentId: int, offset: int) -> memoryview:
+
+        """Returns view of a single record at offset taken from the offset index"""
+
+        data = self.mapSegment(segmentId, offset + _LENGTH.size)
+        (length,) = _LENGTH.unpack_from(data, offset)
+
+        start = offset + _LENGTH.size
+        if start + length > len(data):
+            data = self.mapSegment(segmentId, start + length)
+
+        return data[start : start + length]
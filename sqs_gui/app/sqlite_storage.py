@@ -0,0 +1,271 @@
+from contextlib import closing
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+import os
+import sqlite3
+
+from .message import Message
+from .records import lazyAttributes
+from .storage import Durability, MessageStorage, MessageSummary
+
+try:
+    import ujson as json  # type: ignore
+except ModuleNotFoundError:
+    import json
+
+
+DATABASE_FILE = "messages.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    sentTimestamp INTEGER NOT NULL,
+    md5OfBody TEXT NOT NULL,
+    body TEXT NOT NULL,
+    attributes TEXT,
+    md5OfAttributes TEXT,
+    sysAttributes TEXT NOT NULL,
+    receiptHandle TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messagesSentTimestamp ON messages (sentTimestamp);
+CREATE INDEX IF NOT EXISTS messagesMd5OfBody ON messages (md5OfBody);
+"""
+
+# Full-text index over bodies, kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messagesFts USING fts5 (
+    body,
+    content='messages',
+    content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messagesFtsInsert AFTER INSERT ON messages BEGIN
+    INSERT INTO messagesFts (rowid, body) VALUES (new.rowid, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messagesFtsDelete AFTER DELETE ON messages BEGIN
+    INSERT INTO messagesFts (messagesFts, rowid, body)
+    VALUES ('delete', old.rowid, old.body);
+END;
+"""
+
+# Group commits are transactions, so durability
+# maps to how SQLite syncs them to disk
+_SYNCHRONOUS = {
+    Durability.none: "OFF",
+    Durability.flush: "NORMAL",
+    Durability.fsync: "FULL",
+}
+
+_COLUMNS = (
+    "id, body, md5OfBody, attributes, md5OfAttributes, sysAttributes, receiptHandle"
+)
+
+
+class SqliteMessageStorage(MessageStorage):
+
+    """Keeps received messages in a SQLite database.
+
+    Messages are indexed by ID, SentTimestamp and MD5 of body, and
+    bodies have a full-text index (if SQLite is built with FTS5), so
+    large dumps can be paged through and searched without loading all
+    messages into memory. Writes are done by the storage thread with
+    one transaction per batch; reads use their own connections.
+    """
+
+    _databasePath: str
+    _hasFullTextIndex: bool
+    _writer: Optional[sqlite3.Connection]
+
+    def __init__(
+        self,
+        queueName: str,
+        durability: Durability = Durability.flush,
+        maxGroupSize: int = 10000,
+        maxGroupDelay: float = 0.05,
+    ) -> None:
+        super().__init__(queueName, durability, maxGroupSize, maxGroupDelay)
+        self._databasePath = os.path.join(self._workdir, DATABASE_FILE)
+        self._writer = None
+
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._hasFullTextIndex = self._createFullTextIndex(connection)
+
+    @property
+    def hasFullTextIndex(self) -> bool:
+        return self._hasFullTextIndex
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._databasePath)
+
+    @staticmethod
+    def _createFullTextIndex(connection: sqlite3.Connection) -> bool:
+
+        try:
+            connection.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+
+        return True
+
+    @classmethod
+    def _toRow(cls, message: Message) -> Tuple[Any, ...]:
+        return (
+            message.id,
+            int(message.sysAttributes.get("SentTimestamp", 0)),
+            message.md5OfBody,
+            message.body,
+            json.dumps(cls.encodeAttributes(message.attributes)),
+            message.md5OfAttributes,
+            json.dumps(message.sysAttributes),
+            message.receiptHandle,
+        )
+
+    @classmethod
+    def _fromRow(cls, row: Sequence[Any]) -> Message:
+
+        id, body, md5OfBody, attributes, md5OfAttributes, sysAttributes, handle = row
+
+        return Message(
+            id=id,
+            body=body,
+            md5OfBody=md5OfBody,
+            attributes=lazyAttributes(json.loads(attributes)),
+            md5OfAttributes=md5OfAttributes,
+            sysAttributes=json.loads(sysAttributes),
+            receiptHandle=handle,
+        )
+
+    def _writeMessages(self, messages: List[Message]) -> int:
+
+        if self._writer is None:
+            self._writer = self._connect()
+            synchronous = _SYNCHRONOUS[self._durability]
+            self._writer.execute(f"PRAGMA synchronous={synchronous}")
+
+        rows = [self._toRow(message) for message in messages]
+        with self._writer:
+            self._writer.executemany(
+                "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+        # Body and attributes as they are stored, in UTF-8
+        return sum(len(row[i].encode()) for row in rows for i in (3, 4, 6))
+
+    def _closeWriter(self):
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _dataExtents(self) -> dict:
+
+        with closing(self._connect()) as connection:
+            (maxRowId,) = connection.execute("SELECT MAX(rowid) FROM messages").fetchone()
+
+        return {"rowid": maxRowId or 0}
+
+    def _idsAfter(self, extents: dict) -> Iterator[str]:
+
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT id FROM messages WHERE rowid > ?",
+                (extents.get("rowid", 0),),
+            ).fetchall()
+
+        return (id for (id,) in rows)
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Message]:
+
+        with closing(self._connect()) as connection:
+            rows = connection.execute(sql, params).fetchall()
+
+        return [self._fromRow(row) for row in rows]
+
+    def countMessages(self) -> int:
+
+        with closing(self._connect()) as connection:
+            (count,) = connection.execute("SELECT COUNT(*) FROM messages").fetchone()
+
+        return count
+
+    def _iterRows(self, batchSize: int, sql: str, params: Sequence[Any] = ()):
+
+        with closing(self._connect()) as connection:
+            cursor = connection.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batchSize)
+                if not rows:
+                    break
+                yield rows
+
+    def iterMessages(self, batchSize: int = 1000) -> Iterator[List[Message]]:
+
+        sql = f"SELECT {_COLUMNS} FROM messages ORDER BY sentTimestamp"
+        for rows in self._iterRows(batchSize, sql):
+            yield [self._fromRow(row) for row in rows]
+
+    def iterSummaries(
+        self,
+        batchSize: int = 1000,
+        previewLength: int = 256,
+    ) -> Iterator[List[MessageSummary]]:
+
+        sql = (
+            "SELECT id, sentTimestamp, substr(body, 1, ?) "
+            "FROM messages ORDER BY sentTimestamp"
+        )
+
+        for rows in self._iterRows(batchSize, sql, (previewLength,)):
+            yield [MessageSummary(id, ts, preview, id) for id, ts, preview in rows]
+
+    def fetchMessage(self, summary: MessageSummary) -> Message:
+
+        message = self.loadMessage(summary.id)
+        if message is None:
+            raise KeyError(summary.id)
+
+        return message
+
+    def loadMessage(self, messageId: str) -> Optional[Message]:
+
+        messages = self._query(
+            f"SELECT {_COLUMNS} FROM messages WHERE id = ?",
+            (messageId,),
+        )
+
+        return messages[0] if messages else None
+
+    def queryPage(self, offset: int, limit: int) -> List[Message]:
+
+        """Returns messages sorted by SentTimestamp, starting from offset"""
+
+        return self._query(
+            f"SELECT {_COLUMNS} FROM messages "
+            "ORDER BY sentTimestamp LIMIT ? OFFSET ?",
+            (limit, offset),
+        )
+
+    def searchMessages(self, text: str, limit: int = 1000) -> List[Message]:
+
+        """Returns messages with body containing text. With full-text index
+        it matches whole words (phrase query), otherwise any substring"""
+
+        if not self._hasFullTextIndex:
+            for char in ("\\", "%", "_"):
+                text = text.replace(char, "\\" + char)
+
+            pattern = "%" + text + "%"
+            return self._query(
+                f"SELECT {_COLUMNS} FROM messages WHERE body LIKE ? ESCAPE '\\' "
+                "ORDER BY sentTimestamp LIMIT ?",
+                (pattern, limit),
+            )
+
+        phrase = '"' + text.replace('"', '""') + '"'
+        return self._query(
+            f"SELECT {_COLUMNS} FROM messages WHERE rowid IN "
+            "(SELECT rowid FROM messagesFts WHERE messagesFts MATCH ?) "
+            "ORDER BY sentTimestamp LIMIT ?",
+            (phrase, limit),
+        )
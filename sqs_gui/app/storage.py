@@ -1,13 +1,28 @@
-from base64 import b64encode, b85decode, b85encode
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from functools import partial
+from heapq import merge
+from multiprocessing import get_context
+import lzma
 import os
-from pyexpat.errors import messages
-from queue import Queue
-from threading import Thread
-from typing import List, Optional
-
-from black import sys
-
-from .receiver import Message
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, TypeVar
+import struct
+import sys
+import zlib
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+from . import records
+from .id_index import MessageIdIndex
+from .message import Message
+from .segments import SegmentLog
 
 try:
     import ujson as json  # type: ignore
@@ -15,42 +30,256 @@ except ModuleNotFoundError:
     import json
 
 
-class MessageDiskStorage:
+CHECKPOINT_FILE = "checkpoint.bin"
+_WRITER_LOCK_FILE = "writer.lock"
+_CHECKPOINT_MAGIC = b"SQSGCKP1"
+# Magic, length of JSON with checkpoint fields. ID index follows JSON
+_CHECKPOINT_HEADER = struct.Struct("<8sI")
+SEGMENTS_DIR = "segments"
+BLOCKS_DIR = "blocks"
+
+# Codec of compressed block, size of uncompressed block
+_BLOCK_HEADER = struct.Struct("<BI")
+_BLOCK_RECORD_LENGTH = struct.Struct("<I")
+
+T = TypeVar("T")
+
+
+def _batched(items: Iterable[T], batchSize: int) -> Iterator[List[T]]:
+
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batchSize:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def getAppDataDir() -> str:
+
+    """Returns directory where data of all queues is stored"""
+
+    appName = "SqsGui"
+    home = os.path.expanduser("~")
+
+    if sys.platform == "win32":
+        appDataPath = os.path.join(home, "AppData", "Roaming")
+    elif sys.platform == "linux":
+        appDataPath = os.path.join(home, ".local", "share")
+    elif sys.platform == "darwin":
+        appDataPath = os.path.join(home, "Library", "Application Support")
+    else:
+        raise ValueError("Unsupported platform")
+
+    return os.path.join(appDataPath, appName)
+
+
+class StorageLockedError(Exception):
+
+    """Queue data is being written by another storage"""
+
+
+class _WriterLock:
+
+    """Exclusive lock of a queue directory held by its writer.
+
+    Lock is taken on an open file, so it conflicts with other storages
+    of the same process too and is released by OS if process dies.
+    """
+
+    _path: str
+    _file: Optional[BinaryIO]
+
+    def __init__(self, path: str):
+        self._path = path
+        self._file = None
+
+    def acquire(self):
+
+        f = open(self._path, "a+b")
+        try:
+            if sys.platform == "win32":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            f.close()
+            raise StorageLockedError(f"Queue data is locked: {self._path}") from e
+
+        self._file = f
+
+    def release(self):
+
+        if self._file is None:
+            return
+
+        if sys.platform == "win32":
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+        self._file.close()
+        self._file = None
+
+
+class Durability(str, Enum):
+
+    none = "none"
+    """Leave written data in process buffers until storage is closed"""
 
-    """Saves received messages on disk"""
+    flush = "flush"
+    """Hand written data to OS after each group commit"""
+
+    fsync = "fsync"
+    """Wait until written data reaches disk after each group commit"""
+
+
+class Compression(str, Enum):
+
+    none = "none"
+    zlib = "zlib"
+    lzma = "lzma"
+
+
+_CODEC_IDS = {
+    Compression.zlib: 1,
+    Compression.lzma: 2,
+}
+
+_COMPRESSORS = {
+    Compression.zlib: partial(zlib.compress, level=6),
+    Compression.lzma: partial(lzma.compress, preset=1),
+}
+
+_DECOMPRESSORS = {
+    1: zlib.decompress,
+    2: lzma.decompress,
+}
+
+
+@dataclass
+class Checkpoint:
+
+    """State of queue dumps, enough to resume receiving without
+    loading stored messages"""
+
+    messageIds: MessageIdIndex = field(default_factory=MessageIdIndex)
+    """IDs of stored messages"""
+
+    lastDumpTime: Optional[float] = None
+    """Time when last dump finished (seconds since epoch)"""
+
+    numDumps: int = 0
+    numReceived: int = 0
+    """Number of messages received by all dumps"""
+
+    extents: dict = field(default_factory=dict)
+    """Size of stored data covered by `messageIds`, backend specific"""
+
+
+class MessageSummary:
+
+    """Metadata of a stored message: enough to show it in a table.
+
+    `location` is opaque to users and tells storage where the
+    full message is, so it can be fetched when it is opened.
+    """
+
+    __slots__ = ("id", "sentTimestamp", "preview", "location")
+
+    id: str
+    sentTimestamp: int
+    preview: str
+    location: object
+
+    def __init__(self, id: str, sentTimestamp: int, preview: str, location: object):
+        self.id = id
+        self.sentTimestamp = sentTimestamp
+        self.preview = preview
+        self.location = location
+
+    def __repr__(self) -> str:
+        return f"MessageSummary(id={self.id!r}, sentTimestamp={self.sentTimestamp!r})"
+
+
+@dataclass
+class WriteStats:
+
+    messages: int = 0
+    bytes: int = 0
+    commits: int = 0
+    seconds: float = 0.0
+    """Time spent writing and committing"""
+
+    @property
+    def messagesPerSecond(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytesPerSecond(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+class MessageStorage:
+
+    """Base class of message storages.
+
+    Received messages are queued by the receiving thread and written by
+    a background storage thread. The thread coalesces queued batches into
+    group commits of up to `maxGroupSize` messages, waiting at most
+    `maxGroupDelay` seconds for more messages, and makes each group as
+    durable as `durability` requires. Subclasses implement writing a
+    group of messages and loading messages back.
+    """
 
     _queue: Queue
     _workdir: str
     _thread: Thread
     _shutdown: bool
-
-    def __init__(self, queueName: str) -> None:
+    _durability: Durability
+    _maxGroupSize: int
+    _maxGroupDelay: float
+    _statsLock: Lock
+    _stats: WriteStats
+    _error: Optional[Exception]
+
+    def __init__(
+        self,
+        queueName: str,
+        durability: Durability = Durability.flush,
+        maxGroupSize: int = 10000,
+        maxGroupDelay: float = 0.05,
+    ) -> None:
         self._thread = Thread(target=self._storageThread, daemon=True)
         self._workdir = self.getDataDir(queueName)
         os.makedirs(self._workdir, exist_ok=True)
+
+        # Modification time of queue directory is its last use
+        # time, storage manager evicts least recently used queues
+        os.utime(self._workdir)
         self._shutdown = False
         self._queue = Queue()
+        self._durability = durability
+        self._maxGroupSize = maxGroupSize
+        self._maxGroupDelay = maxGroupDelay
+        self._statsLock = Lock()
+        self._stats = WriteStats()
+        self._error = None
 
     def getDataDir(self, queueName: str):
-
-        appName = "SqsGui"
-        home = os.path.expanduser("~")
-
-        if sys.platform == "win32":
-            appDataPath = os.path.join(home, "AppData", "Roaming")
-        elif sys.platform == "linux":
-            appDataPath = os.path.join(home, ".local", "share")
-        elif sys.platform == "darwin":
-            appDataPath = os.path.join(home, "Library", "Application Support")
-        else:
-            raise ValueError("Unsupported platform")
-
-        return os.path.join(appDataPath, appName, queueName)
+        return os.path.join(getAppDataDir(), queueName)
 
     def saveMessage(self, message: Message):
-        self._queue.put(message)
+        self._queue.put([message])
+
+    def saveMessages(self, messages: List[Message]):
+        self._queue.put(messages)
 
     def startReceivingJobs(self):
+        self._openWriter()
         self._thread.start()
 
     def stopReceivingJobs(self):
@@ -67,53 +296,657 @@ class MessageDiskStorage:
     def hasUnfinishedJobs(self):
         return self._thread.is_alive() and not self._queue.empty()
 
-    @staticmethod
-    def serialize(message: Message) -> str:
+    @property
+    def failed(self) -> bool:
 
-        if message.attributes is not None:
-            for data in message.attributes.values():
-                if data["DataType"] == "Binary":
-                    data["BinaryValue"] = b85encode(data["BinaryValue"]).decode()
+        """Tells if storage thread stopped on a write error. Messages
+        queued after the error are not stored"""
 
-        return json.dumps(message.dict())
+        return self._error is not None
 
-    @staticmethod
-    def deserialize(data: str) -> Message:
+    decodeAttributes = staticmethod(records.decodeAttributes)
+    encodeAttributes = staticmethod(records.encodeAttributes)
 
-        message = Message.parse_obj(json.loads(data))
+    @property
+    def writeStats(self) -> WriteStats:
+        with self._statsLock:
+            return replace(self._stats)
 
-        if message.attributes is not None:
-            for data in message.attributes.values():
-                if data["DataType"] == "Binary":
-                    data["BinaryValue"] = b85decode(data["BinaryValue"]).decode()
+    def _writeMessages(self, messages: List[Message]) -> int:
 
-        return message
+        """Writes and commits group of messages. Returns number of bytes"""
 
-    def _storageThread(self):
+        raise NotImplementedError()
+
+    def _openWriter(self):
+
+        """Prepares storage for writing. Raises `StorageLockedError`
+        if queue data is being written by another storage"""
+
+    def _closeWriter(self):
+        pass
+
+    def _takeGroup(self, messages: List[Message]) -> bool:
+
+        """Adds queued messages to group until it is full or delay expires.
+        Returns False when there will be no more messages"""
+
+        deadline = monotonic() + self._maxGroupDelay
 
-        while not self._shutdown:
+        while len(messages) < self._maxGroupSize:
 
-            message: Optional[Message] = self._queue.get()
-            if message is None or self._shutdown:
+            timeLeft = deadline - monotonic()
+            if timeLeft <= 0:
                 break
 
-            filepath = os.path.join(self._workdir, message.id)
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(self.serialize(message))
+            try:
+                moreMessages: Optional[List[Message]]
+                moreMessages = self._queue.get(timeout=timeLeft)
+            except Empty:
+                break
+
+            if moreMessages is None:
+                return False
+
+            messages.extend(moreMessages)
+
+        return True
+
+    def _storageThread(self):
+
+        try:
+            hasMoreMessages = True
+            while hasMoreMessages and not self._shutdown:
+
+                messages: Optional[List[Message]] = self._queue.get()
+                if messages is None or self._shutdown:
+                    break
+
+                group = list(messages)
+                hasMoreMessages = self._takeGroup(group)
+                if self._shutdown:
+                    break
+
+                start = monotonic()
+                numBytes = self._writeMessages(group)
+                elapsed = monotonic() - start
+
+                with self._statsLock:
+                    self._stats.messages += len(group)
+                    self._stats.bytes += numBytes
+                    self._stats.commits += 1
+                    self._stats.seconds += elapsed
+
+        except Exception as e:
+            print(f"Error - {e}")
+            self._error = e
+
+        finally:
+            self._closeWriter()
+
+    def _dataExtents(self) -> dict:
+
+        """Describes how much data is stored, see `_idsAfter`"""
+
+        return {}
+
+    def _idsAfter(self, extents: dict) -> Iterator[str]:
+
+        """Yields IDs of messages stored after data extents were taken.
+        Raises ValueError if stored data no longer matches extents"""
+
+        return iter(())
+
+    def saveCheckpoint(self, checkpoint: Checkpoint):
+
+        """Saves checkpoint. Should be called when pending
+        jobs are done, so stored data matches its ID index.
+        Raises the write error if storage failed, since the
+        index then has IDs of messages which are not stored"""
+
+        if self._error is not None:
+            raise self._error
+
+        checkpoint.extents = self._dataExtents()
+        fields = json.dumps(
+            {
+                "lastDumpTime": checkpoint.lastDumpTime,
+                "numDumps": checkpoint.numDumps,
+                "numReceived": checkpoint.numReceived,
+                "extents": checkpoint.extents,
+            }
+        ).encode()
+
+        filepath = os.path.join(self._workdir, CHECKPOINT_FILE)
+        tmpFilepath = filepath + ".tmp"
+
+        with open(tmpFilepath, "wb") as f:
+            f.write(_CHECKPOINT_HEADER.pack(_CHECKPOINT_MAGIC, len(fields)))
+            f.write(fields)
+            checkpoint.messageIds.save(f)
+
+            # Otherwise a crash can leave renamed but empty file
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmpFilepath, filepath)
+
+    def loadCheckpoint(self) -> Optional[Checkpoint]:
+
+        """Loads checkpoint and adds IDs of messages stored after it was
+        saved (e.g. before a crash) to its ID index. Returns None if there
+        is no valid checkpoint, then ID index has to be rebuilt"""
+
+        filepath = os.path.join(self._workdir, CHECKPOINT_FILE)
+        if not os.path.exists(filepath):
+            return None
+
+        try:
+            with open(filepath, "rb") as f:
+                magic, length = _CHECKPOINT_HEADER.unpack(
+                    f.read(_CHECKPOINT_HEADER.size)
+                )
+                if magic != _CHECKPOINT_MAGIC:
+                    raise ValueError("Not a checkpoint file")
+
+                fields = json.loads(f.read(length))
+                messageIds = MessageIdIndex.load(f)
+
+            messageIds.update(self._idsAfter(fields["extents"]))
+
+        except (ValueError, KeyError, EOFError, OSError, struct.error) as e:
+            print(f"Error - {e}")
+            return None
+
+        return Checkpoint(messageIds, **fields)
+
+    def iterMessages(self, batchSize: int = 1000) -> Iterator[List[Message]]:
+
+        """Loads stored messages in batches of up to batchSize messages"""
+
+        raise NotImplementedError()
+
+    def iterSummaries(
+        self,
+        batchSize: int = 1000,
+        previewLength: int = 256,
+    ) -> Iterator[List[MessageSummary]]:
+
+        """Loads metadata of stored messages in batches, without parsing
+        whole messages. Body preview is cut to previewLength characters"""
+
+        raise NotImplementedError()
+
+    def fetchMessage(self, summary: MessageSummary) -> Message:
+
+        """Loads full message for summary returned by `iterSummaries`"""
+
+        raise NotImplementedError()
+
+    def readBody(self, summary: MessageSummary) -> memoryview:
+
+        """Returns UTF-8 encoded body of message for summary"""
+
+        return memoryview(self.fetchMessage(summary).body.encode())
 
     def loadMessages(self) -> List[Message]:
 
         messages = []
+        for batch in self.iterMessages():
+            messages.extend(batch)
+
+        return messages
 
-        def loadMessage(data: str):
+
+def _sentTimestamp(message: Message) -> int:
+    return int(message.sysAttributes.get("SentTimestamp", 0))
+
+
+# Location of record: (log, segmentId, offset) or, for
+# records of compressed blocks, (log, segmentId, offset, offset in block)
+_Location = tuple
+
+# Chunk of stored messages to be loaded by a worker process: ("files",
+# paths) or (log, directory, segmentId, start offset, end offset)
+_Chunk = tuple
+
+# Starting a worker process takes about as long as parsing a chunk,
+# smaller dumps are parsed faster in process
+_MIN_PARALLEL_CHUNKS = 4
+
+
+def _processPool(numWorkers: int) -> ProcessPoolExecutor:
+
+    # Forked child inherits locks held by Qt and receiver threads
+    # and may deadlock, so workers start as fresh interpreters
+    return ProcessPoolExecutor(numWorkers, mp_context=get_context("spawn"))
+
+
+def _scanLog(
+    name: str,
+    log: SegmentLog,
+    segmentId: int,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> Iterator[Tuple[_Location, memoryview]]:
+
+    """Yields records of log segment with their locations.
+    Blocks are decompressed"""
+
+    for offset, record in log.scanRecords(segmentId, start, end):
+
+        if name != BLOCKS_DIR:
+            yield (name, segmentId, offset), record
+            continue
+
+        try:
+            data = MessageDiskStorage.decodeBlock(record)
+        except Exception as e:
+            print(f"Error - {e}")
+            continue
+
+        for blockOffset, blockRecord in MessageDiskStorage.scanBlock(data):
+            yield (name, segmentId, offset, blockOffset), blockRecord
+
+
+def _loadChunk(chunk: _Chunk) -> List[Message]:
+
+    """Loads chunk of stored messages sorted by SentTimestamp"""
+
+    messages = []
+
+    kind, *args = chunk
+    if kind == "files":
+        (filepaths,) = args
+        for filepath in filepaths:
             try:
-                messages.append(self.deserialize(data))
+                with open(filepath, "r", encoding="utf-8") as f:
+                    messages.append(MessageDiskStorage.deserialize(f.read()))
             except Exception as e:
                 print(f"Error - {e}")
 
+    else:
+        directory, segmentId, start, end = args
+        log = SegmentLog(directory)
+
+        for _, record in _scanLog(kind, log, segmentId, start, end):
+            try:
+                messages.append(records.decodeRecord(record))
+            except Exception as e:
+                print(f"Error - {e}")
+
+    messages.sort(key=_sentTimestamp)
+    return messages
+
+
+class MessageDiskStorage(MessageStorage):
+
+    """Saves received messages on disk.
+
+    Messages are appended to a segment log (see `SegmentLog`) as compact
+    binary records (see `records.encodeRecord`): a header with record
+    version, SentTimestamp and field lengths, then raw fields, so binary
+    attributes are stored as they are. Records of any version are read
+    back, and so are JSON files per message saved by older versions.
+
+    With `compression` set, records of each group commit are packed into
+    blocks of up to `maxBlockSize` bytes which are compressed and appended
+    to a separate block log. Queues usually carry similar payloads, so
+    blocks compress much better than single records and reload reads
+    several times less from disk.
+
+    Only one storage of a queue writes at a time: `startReceivingJobs`
+    raises `StorageLockedError` while another one (e.g. of another app
+    instance) is writing. Stored messages can still be read.
+    """
+
+    _log: SegmentLog
+    _blockLog: SegmentLog
+    _compression: Compression
+    _maxBlockSize: int
+    _lastBlock: Tuple[object, memoryview]
+    _writerLock: _WriterLock
+
+    def __init__(
+        self,
+        queueName: str,
+        durability: Durability = Durability.flush,
+        maxGroupSize: int = 10000,
+        maxGroupDelay: float = 0.05,
+        compression: Compression = Compression.none,
+        maxBlockSize: int = 256 * 1024,
+    ) -> None:
+        super().__init__(queueName, durability, maxGroupSize, maxGroupDelay)
+        self._log = SegmentLog(os.path.join(self._workdir, SEGMENTS_DIR))
+        self._blockLog = SegmentLog(os.path.join(self._workdir, BLOCKS_DIR))
+        self._compression = compression
+        self._maxBlockSize = maxBlockSize
+        self._writerLock = _WriterLock(os.path.join(self._workdir, _WRITER_LOCK_FILE))
+        self._lastBlock = (None, memoryview(b""))
+
+    def _logs(self) -> List[Tuple[str, SegmentLog]]:
+        return [(SEGMENTS_DIR, self._log), (BLOCKS_DIR, self._blockLog)]
+
+    @staticmethod
+    def serialize(message: Message) -> str:
+
+        """Serializes message as JSON file of older versions"""
+
+        obj = message.dict()
+        obj["attributes"] = records.encodeAttributes(message.attributes)
+        return json.dumps(obj)
+
+    @classmethod
+    def deserialize(cls, data: str) -> Message:
+
+        obj = json.loads(data)
+        obj["attributes"] = records.lazyAttributes(obj.pop("attributes", None))
+
+        return Message.parse_obj(obj)
+
+    def encodeBlock(self, blockRecords: List[bytes]) -> bytes:
+
+        chunks = []
+        for record in blockRecords:
+            chunks.append(_BLOCK_RECORD_LENGTH.pack(len(record)))
+            chunks.append(record)
+
+        data = b"".join(chunks)
+        codec = _CODEC_IDS[self._compression]
+        header = _BLOCK_HEADER.pack(codec, len(data))
+        return header + _COMPRESSORS[self._compression](data)
+
+    @staticmethod
+    def decodeBlock(block: records.Buffer) -> memoryview:
+
+        codec, size = _BLOCK_HEADER.unpack_from(block)
+        data = _DECOMPRESSORS[codec](block[_BLOCK_HEADER.size :])
+
+        if len(data) != size:
+            raise ValueError("Corrupted block")
+
+        return memoryview(data)
+
+    @staticmethod
+    def scanBlock(data: memoryview) -> Iterator[Tuple[int, memoryview]]:
+
+        """Yields records of decompressed block with their offsets"""
+
+        offset = 0
+        while offset < len(data):
+            (length,) = _BLOCK_RECORD_LENGTH.unpack_from(data, offset)
+            start = offset + _BLOCK_RECORD_LENGTH.size
+            yield offset, data[start : start + length]
+            offset = start + length
+
+    def _writeRecords(self, messages: List[Message]) -> int:
+
+        numBytes = 0
+        for message in messages:
+            record = records.encodeRecord(message)
+            self._log.append(record)
+            numBytes += len(record)
+
+        return numBytes
+
+    def _writeBlocks(self, messages: List[Message]) -> int:
+
+        numBytes = 0
+        blockRecords: List[bytes] = []
+        blockSize = 0
+
+        for message in messages:
+            record = records.encodeRecord(message)
+            blockRecords.append(record)
+            blockSize += len(record)
+
+            if blockSize >= self._maxBlockSize:
+                block = self.encodeBlock(blockRecords)
+                self._blockLog.append(block)
+                numBytes += len(block)
+                blockRecords, blockSize = [], 0
+
+        if blockRecords:
+            block = self.encodeBlock(blockRecords)
+            self._blockLog.append(block)
+            numBytes += len(block)
+
+        return numBytes
+
+    def _writeMessages(self, messages: List[Message]) -> int:
+
+        if self._compression == Compression.none:
+            log = self._log
+            numBytes = self._writeRecords(messages)
+        else:
+            log = self._blockLog
+            numBytes = self._writeBlocks(messages)
+
+        if self._durability == Durability.flush:
+            log.flush()
+        elif self._durability == Durability.fsync:
+            log.sync()
+
+        return numBytes
+
+    def _openWriter(self):
+
+        # Opening segment for appending cuts its torn tail,
+        # which may be a record another writer is appending
+        self._writerLock.acquire()
+
+    def _closeWriter(self):
+        self._log.close()
+        self._blockLog.close()
+        self._writerLock.release()
+
+    def _scanRecords(self) -> Iterator[Tuple[_Location, memoryview]]:
+
+        for name, log in self._logs():
+            for segmentId in log.segmentIds():
+                yield from _scanLog(name, log, segmentId)
+
+    def _readRecord(self, location: _Location) -> memoryview:
+
+        """Reads record at location of `iterSummaries`. Last block is
+        cached, so reading records one by one decompresses each block once"""
+
+        name, segmentId, offset, *blockOffset = location
+        log = dict(self._logs())[name]
+
+        if not blockOffset:
+            return log.readRecord(segmentId, offset)
+
+        blockLocation, data = self._lastBlock
+        if blockLocation != location[:3]:
+            blockLocation = location[:3]
+            data = self.decodeBlock(log.readRecord(segmentId, offset))
+            self._lastBlock = (blockLocation, data)
+
+        (length,) = _BLOCK_RECORD_LENGTH.unpack_from(data, blockOffset[0])
+        start = blockOffset[0] + _BLOCK_RECORD_LENGTH.size
+        return data[start : start + length]
+
+    def _legacyFiles(self) -> Iterator[str]:
+
+        """Lists messages saved by older versions as a JSON file per message"""
+
         for filename in os.listdir(self._workdir):
+
+            # Message files have no extension, unlike
+            # indexes and files of other storages
+            if "." in filename:
+                continue
+
             filepath = os.path.join(self._workdir, filename)
-            with open(filepath, "r", encoding="utf-8") as f:
-                loadMessage(f.read())
+            if os.path.isfile(filepath):
+                yield filepath
 
-        return messages
+    def _loadLegacyMessage(self, filepath: str) -> Message:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return self.deserialize(f.read())
+
+    def _iterMessages(self) -> Iterator[Message]:
+
+        for filepath in self._legacyFiles():
+            try:
+                yield self._loadLegacyMessage(filepath)
+            except Exception as e:
+                print(f"Error - {e}")
+
+        for _, record in self._scanRecords():
+            try:
+                yield records.decodeRecord(record)
+            except Exception as e:
+                print(f"Error - {e}")
+
+    def iterMessages(self, batchSize: int = 1000) -> Iterator[List[Message]]:
+        return _batched(self._iterMessages(), batchSize)
+
+    def _dataExtents(self) -> dict:
+
+        extents = {}
+        for name, log in self._logs():
+            segmentIds = log.segmentIds()
+            if segmentIds:
+                lastId = segmentIds[-1]
+                extents[name] = [lastId, os.path.getsize(log.segmentPath(lastId))]
+
+        return extents
+
+    def _idsAfter(self, extents: dict) -> Iterator[str]:
+
+        for name, log in self._logs():
+
+            # Segments are only appended to, so new records
+            # are at the end of the last segment and after it
+            lastId, size = extents.get(name, (0, 0))
+            segmentIds = [id for id in log.segmentIds() if id >= lastId]
+
+            if lastId and (not segmentIds or segmentIds[0] != lastId):
+                raise ValueError(f"Segment {lastId} was removed")
+
+            if lastId and os.path.getsize(log.segmentPath(lastId)) < size:
+                raise ValueError(f"Segment {lastId} was truncated")
+
+            for segmentId in segmentIds:
+                start = size if segmentId == lastId else None
+                for _, record in _scanLog(name, log, segmentId, start):
+                    yield records.decodeRecordId(record)
+
+    def _logChunks(self, name: str, log: SegmentLog, chunkSize: int) -> List[_Chunk]:
+
+        """Splits log into chunks of chunkSize records using offset indexes.
+        Last chunk of segment is open-ended, so records missing from
+        a stale offset index are loaded too"""
+
+        chunks = []
+        for segmentId in log.segmentIds():
+            try:
+                starts = list(log.readOffsets(segmentId)[::chunkSize])
+            except (OSError, ValueError):
+                starts = []
+
+            starts = starts or [None]
+            ends = starts[1:] + [None]
+            for start, end in zip(starts, ends):
+                chunks.append((name, log.directory, segmentId, start, end))
+
+        return chunks
+
+    def _chunks(self, chunkSize: int) -> List[_Chunk]:
+
+        chunks: List[_Chunk] = []
+        filepaths = list(self._legacyFiles())
+        for i in range(0, len(filepaths), chunkSize):
+            chunks.append(("files", filepaths[i : i + chunkSize]))
+
+        for name, log in self._logs():
+
+            # Block holds many records, chunks of blocks are smaller
+            logChunkSize = chunkSize
+            if name == BLOCKS_DIR:
+                logChunkSize = max(1, chunkSize * 1024 // self._maxBlockSize)
+
+            chunks.extend(self._logChunks(name, log, logChunkSize))
+
+        return chunks
+
+    def loadMessages(
+        self,
+        numWorkers: Optional[int] = None,
+        chunkSize: int = 20000,
+    ) -> List[Message]:
+
+        """Loads all stored messages sorted by SentTimestamp.
+
+        Stored messages are split into chunks of about chunkSize messages
+        which are parsed by a pool of numWorkers processes (CPU count by
+        default) and merged. With a single worker or a dump of fewer than
+        `_MIN_PARALLEL_CHUNKS` chunks messages are parsed in this process.
+        """
+
+        if numWorkers is None:
+            numWorkers = os.cpu_count() or 1
+
+        chunks = self._chunks(chunkSize)
+        if numWorkers == 1 or len(chunks) < _MIN_PARALLEL_CHUNKS:
+            results = [_loadChunk(chunk) for chunk in chunks]
+        else:
+            with _processPool(min(numWorkers, len(chunks))) as executor:
+                results = list(executor.map(_loadChunk, chunks))
+
+        return list(merge(*results, key=_sentTimestamp))
+
+    def _iterSummaries(self, previewLength: int) -> Iterator[MessageSummary]:
+
+        # Legacy files have to be parsed anyway
+        for filepath in self._legacyFiles():
+            try:
+                message = self._loadLegacyMessage(filepath)
+            except Exception as e:
+                print(f"Error - {e}")
+                continue
+
+            yield MessageSummary(
+                message.id,
+                int(message.sysAttributes.get("SentTimestamp", 0)),
+                message.body[:previewLength],
+                filepath,
+            )
+
+        for location, record in self._scanRecords():
+            try:
+                summary = records.recordSummary(record, previewLength)
+                yield MessageSummary(*summary, location)
+            except Exception as e:
+                print(f"Error - {e}")
+
+    def iterSummaries(
+        self,
+        batchSize: int = 1000,
+        previewLength: int = 256,
+    ) -> Iterator[List[MessageSummary]]:
+
+        # Scanning metadata is cheaper than starting worker
+        # processes, so summaries are always read in process
+        return _batched(self._iterSummaries(previewLength), batchSize)
+
+    def readBody(self, summary: MessageSummary) -> memoryview:
+
+        """Returns UTF-8 encoded body of message. For uncompressed messages
+        it is a view into the mapped segment, the body is not copied"""
+
+        if isinstance(summary.location, str):
+            return super().readBody(summary)
+
+        record = self._readRecord(summary.location)  # type: ignore
+        return memoryview(records.recordBody(record))
+
+    def fetchMessage(self, summary: MessageSummary) -> Message:
+
+        if isinstance(summary.location, str):
+            return self._loadLegacyMessage(summary.location)
+
+        record = self._readRecord(summary.location)  # type: ignore
+        return records.decodeRecord(record)
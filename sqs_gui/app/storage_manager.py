@@ -0,0 +1,286 @@
+from dataclasses import dataclass, field
+from threading import Lock
+from time import time
+from typing import Dict, Iterable, List, Optional
+import os
+import shutil
+
+from .segments import SegmentLog
+from .storage import BLOCKS_DIR, CHECKPOINT_FILE, SEGMENTS_DIR, getAppDataDir
+from .sqlite_storage import DATABASE_FILE
+
+
+@dataclass
+class StorageLimits:
+
+    maxQueueBytes: Optional[int] = 1024 ** 3
+    """Evict oldest data of a queue when it takes more than N bytes"""
+
+    maxTotalBytes: Optional[int] = 10 * 1024 ** 3
+    """Evict data of least recently used queues when all queues take more"""
+
+    maxAge: Optional[float] = 30 * 24 * 3600
+    """Evict data written more than N seconds ago"""
+
+
+@dataclass
+class _Unit:
+
+    """Files evicted together: a segment with its offset
+    index, a legacy message file or a SQLite database"""
+
+    paths: List[str]
+    size: int
+    mtime: float
+
+
+@dataclass
+class _QueueData:
+
+    name: str
+    directory: str
+    lastUsed: float
+    units: List[_Unit] = field(default_factory=list)
+    inUse: bool = False
+    evicted: bool = False
+    """Checkpoint was removed, queue lost some data"""
+    failed: bool = False
+    """Some files could not be removed"""
+
+    @property
+    def size(self) -> int:
+        return sum(unit.size for unit in self.units)
+
+
+def _fileSize(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _fileMtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _makeUnit(paths: List[str]) -> Optional[_Unit]:
+
+    # Files may be removed by a storage while queue is scanned
+    mtimes = [mtime for mtime in map(_fileMtime, paths) if mtime is not None]
+    if not mtimes:
+        return None
+
+    return _Unit(
+        paths=paths,
+        size=sum(_fileSize(path) for path in paths),
+        mtime=max(mtimes),
+    )
+
+
+class StorageManager:
+
+    """Keeps stored queue dumps within disk quotas.
+
+    Data of each queue is split into units which are evicted whole:
+    segments (with their offset indexes), legacy message files and SQLite
+    databases. `enforce` first evicts units older than `maxAge`, then the
+    oldest units of queues over `maxQueueBytes`, then, while all queues
+    take more than `maxTotalBytes`, units of least recently used queues.
+    Directories of queues left without data are removed. Checkpoint of a
+    queue that lost data is removed too, so its ID index is rebuilt from
+    remaining messages and evicted messages can be received again.
+
+    Queues opened with `openQueue` (shown in a tab or being dumped) are
+    not touched until they are closed with `closeQueue`. Queues are
+    checked before each unit is evicted, so a queue opened while
+    `enforce` runs in another thread loses no more data.
+    """
+
+    _dataDir: str
+    _limits: StorageLimits
+    _lock: Lock
+    _enforceLock: Lock
+    _openQueues: Dict[str, int]
+
+    def __init__(
+        self,
+        limits: Optional[StorageLimits] = None,
+        dataDir: Optional[str] = None,
+    ):
+        self._limits = limits or StorageLimits()
+        self._dataDir = dataDir or getAppDataDir()
+        self._lock = Lock()
+        self._enforceLock = Lock()
+        self._openQueues = {}
+
+    @property
+    def limits(self) -> StorageLimits:
+        return self._limits
+
+    def _scanQueue(self, name: str) -> _QueueData:
+
+        directory = os.path.join(self._dataDir, name)
+        queue = _QueueData(name, directory, os.path.getmtime(directory))
+        unitPaths = []
+
+        for logDir in (SEGMENTS_DIR, BLOCKS_DIR):
+            logPath = os.path.join(directory, logDir)
+            if not os.path.isdir(logPath):
+                continue
+
+            log = SegmentLog(logPath)
+            for segmentId in log.segmentIds():
+                unitPaths.append([log.segmentPath(segmentId), log.offsetsPath(segmentId)])
+
+        databasePath = os.path.join(directory, DATABASE_FILE)
+        if os.path.exists(databasePath):
+            unitPaths.append([databasePath + suffix for suffix in ("", "-wal", "-shm")])
+
+        # Legacy message files have no extension
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            if "." not in filename and os.path.isfile(path):
+                unitPaths.append([path])
+
+        for paths in unitPaths:
+            unit = _makeUnit(paths)
+            if unit is not None:
+                queue.units.append(unit)
+
+        queue.units.sort(key=lambda unit: unit.mtime)
+        return queue
+
+    def _scanQueues(self, exclude: Iterable[str] = ()) -> List[_QueueData]:
+
+        if not os.path.isdir(self._dataDir):
+            return []
+
+        exclude = set(exclude)
+        queues = []
+
+        for name in os.listdir(self._dataDir):
+            if name not in exclude and os.path.isdir(os.path.join(self._dataDir, name)):
+                queues.append(self._scanQueue(name))
+
+        return queues
+
+    def queueSizes(self) -> Dict[str, int]:
+
+        """Returns number of bytes taken by each stored queue"""
+
+        return {queue.name: queue.size for queue in self._scanQueues()}
+
+    def openQueue(self, name: str):
+
+        """Protects data of queue from eviction until it is closed.
+        Queue may be opened several times, e.g. by a tab and a dump"""
+
+        with self._lock:
+            self._openQueues[name] = self._openQueues.get(name, 0) + 1
+
+    def closeQueue(self, name: str):
+
+        with self._lock:
+            count = self._openQueues.pop(name, 0) - 1
+            if count > 0:
+                self._openQueues[name] = count
+
+    @staticmethod
+    def _removeFile(path: str, removed: List[str]) -> bool:
+
+        # File may be in use by another process, e.g. mapped
+        # segment can't be removed on Windows. It is kept
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        except OSError as e:
+            print(f"Error - {e}")
+            return False
+
+        return True
+
+    def _evict(self, queue: _QueueData, unit: _Unit, removed: List[str]) -> bool:
+
+        """Removes files of unit unless queue was opened. Returns
+        False if they were not removed. Unit is dropped from queue
+        either way, so it is not tried again"""
+
+        queue.units.remove(unit)
+
+        with self._lock:
+            if queue.name in self._openQueues:
+                queue.inUse = True
+                return False
+
+            # Checkpoint goes first, so queue opened after this
+            # rebuilds its ID index from the remaining data
+            if not queue.evicted:
+                checkpointPath = os.path.join(queue.directory, CHECKPOINT_FILE)
+                if not self._removeFile(checkpointPath, removed):
+                    queue.failed = True
+                    return False
+                queue.evicted = True
+
+            if not all([self._removeFile(path, removed) for path in unit.paths]):
+                queue.failed = True
+                return False
+
+        return True
+
+    def enforce(self, exclude: Iterable[str] = ()) -> List[str]:
+
+        """Evicts data over limits. Open queues and queues in exclude
+        are left untouched. Returns paths of removed files"""
+
+        with self._enforceLock:
+            return self._enforce(exclude)
+
+    def _enforce(self, exclude: Iterable[str]) -> List[str]:
+
+        removed: List[str] = []
+        queues = self._scanQueues(exclude)
+        limits = self._limits
+
+        if limits.maxAge is not None:
+            expiry = time() - limits.maxAge
+            for queue in queues:
+                for unit in [unit for unit in queue.units if unit.mtime < expiry]:
+                    if queue.inUse:
+                        break
+                    self._evict(queue, unit, removed)
+
+        if limits.maxQueueBytes is not None:
+            for queue in queues:
+                while (
+                    queue.units
+                    and not queue.inUse
+                    and queue.size > limits.maxQueueBytes
+                ):
+                    self._evict(queue, queue.units[0], removed)
+
+        if limits.maxTotalBytes is not None:
+            totalSize = sum(queue.size for queue in queues)
+            for queue in sorted(queues, key=lambda queue: queue.lastUsed):
+                while (
+                    queue.units
+                    and not queue.inUse
+                    and totalSize > limits.maxTotalBytes
+                ):
+                    unit = queue.units[0]
+                    if self._evict(queue, unit, removed):
+                        totalSize -= unit.size
+
+        for queue in queues:
+            if queue.units or queue.inUse or queue.failed:
+                continue
+
+            with self._lock:
+                if queue.name not in self._openQueues:
+                    shutil.rmtree(queue.directory, ignore_errors=True)
+                    removed.append(queue.directory)
+
+        return removed
@@ -0,0 +1,56 @@
+from typing import Callable, List, Optional
+import os
+
+import pytest
+
+from sqs_gui.app.id_index import MessageIdIndex
+from sqs_gui.app.message import Message
+from sqs_gui.app.segments import SegmentLog
+from sqs_gui.app.storage import Checkpoint, MessageDiskStorage, getAppDataDir
+
+
+@pytest.fixture
+def app_data_dir(monkeypatch, tmp_path) -> str:
+
+    """Stores data of queues in a temporary home directory"""
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    monkeypatch.setattr("sys.platform", "linux")
+    return getAppDataDir()
+
+
+@pytest.fixture
+def dump_queue(app_data_dir) -> Callable[..., MessageDiskStorage]:
+
+    """Dumps messages to small segments and saves a checkpoint.
+    Segments get modification times one second apart, starting
+    from `lastUsed`, as if they were written one after another"""
+
+    def dump(
+        queueName: str,
+        messages: List[Message],
+        lastUsed: Optional[float] = None,
+    ) -> MessageDiskStorage:
+
+        storage = MessageDiskStorage(queueName)
+        storage._log = SegmentLog(storage._log.directory, maxSegmentSize=1024)
+        storage.startReceivingJobs()
+        storage.saveMessages(messages)
+        storage.waitPendingJobsDone()
+        storage.saveCheckpoint(Checkpoint(MessageIdIndex(msg.id for msg in messages)))
+
+        if lastUsed is None:
+            return storage
+
+        for segmentId in storage._log.segmentIds():
+            for path in (
+                storage._log.segmentPath(segmentId),
+                storage._log.offsetsPath(segmentId),
+            ):
+                os.utime(path, (lastUsed + segmentId, lastUsed + segmentId))
+
+        os.utime(storage._workdir, (lastUsed, lastUsed))
+        return storage
+
+    return dump
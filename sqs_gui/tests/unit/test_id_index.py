@@ -0,0 +1,46 @@
+from io import BytesIO
+from uuid import uuid4
+
+from sqs_gui.app.id_index import MessageIdIndex
+
+
+def test_message_id_index_membership():
+
+    ids = [str(uuid4()) for _ in range(10000)] + ["custom-id"]
+    index = MessageIdIndex(ids[:5000])
+    index.update(ids[5000:])
+    index.add(ids[0])
+
+    assert len(index) == len(ids)
+    assert all(message_id in index for message_id in ids)
+    assert str(uuid4()) not in index
+    assert "other-id" not in index
+
+
+def test_message_id_index_save_load():
+
+    ids = [str(uuid4()) for _ in range(100)]
+    buffer = BytesIO()
+    MessageIdIndex(ids).save(buffer)
+
+    buffer.seek(0)
+    index = MessageIdIndex.load(buffer)
+
+    assert len(index) == len(ids)
+    assert all(message_id in index for message_id in ids)
+
+
+def test_message_id_index_background_merge(monkeypatch):
+
+    monkeypatch.setattr(MessageIdIndex, "_merge_size", 100)
+    ids = [str(uuid4()) for _ in range(5000)]
+    index = MessageIdIndex(ids[:1000])
+
+    # Keys are found while being merged
+    for i, message_id in enumerate(ids[1000:], 1000):
+        index.add(message_id)
+        assert ids[i - 1] in index and message_id in index
+
+    index._wait_merge()
+    assert len(index) == len(ids)
+    assert all(message_id in index for message_id in ids)
@@ -0,0 +1,131 @@
+import json
+
+from PyQt5.QtWidgets import QPlainTextEdit
+
+from sqs_gui.app.components.message_details_pane import (
+    MessageDetailsPane,
+    RENDER_CHUNK_SIZE,
+    Syntax,
+    Token,
+    prepareDetails,
+)
+from sqs_gui.app.components.messages_pane import MessagesPane
+from sqs_gui.app.receiver import Message
+from sqs_gui.app.storage import MessageDiskStorage
+
+
+def make_message(body: str, **kwargs) -> Message:
+    return Message(
+        id="id-1",
+        body=body,
+        md5OfBody="md5",
+        sysAttributes={"SentTimestamp": "1600000000000"},
+        receiptHandle="handle",
+        **kwargs,
+    )
+
+
+def tokens(details):
+    return [
+        (details.text[start : start + length], Token(kind))
+        for start, length, kind in zip(
+            details.tokenStarts, details.tokenLengths, details.tokenKinds
+        )
+    ]
+
+
+def test_prepare_details():
+
+    message = make_message(
+        '{"a": [1, true], "b": "x"}',
+        attributes={
+            "trace": {"DataType": "String", "StringValue": "t-1"},
+            "blob": {"DataType": "Binary", "BinaryValue": b"\x00\x01"},
+        },
+    )
+
+    details = prepareDetails(message)
+    assert details.syntax == Syntax.json
+    assert details.text == json.dumps(json.loads(message.body), indent=2)
+    assert tokens(details) == [
+        ('"a"', Token.key),
+        ("1", Token.number),
+        ("true", Token.literal),
+        ('"b"', Token.key),
+        ('"x"', Token.string),
+    ]
+    assert details.attributes == [
+        ("blob", "Binary", "<2 bytes> 00 01"),
+        ("trace", "String", "t-1"),
+    ]
+    assert ("Receipt handle", "handle") in details.fields
+
+    details = prepareDetails(make_message('<a x="1"><b>text</b><!-- c --></a>'))
+    assert details.syntax == Syntax.xml
+    assert details.text.splitlines()[1:3] == ['<a x="1">', "  <b>text</b>"]
+    assert ("x", Token.attribute) in tokens(details)
+    assert ("<!-- c -->", Token.comment) in tokens(details)
+
+    details = prepareDetails(make_message("{not json"))
+    assert details.syntax == Syntax.text
+    assert details.text == "{not json"
+    assert not details.tokenKinds
+
+    # Positions are in UTF-16 code units
+    details = prepareDetails(make_message('{"\U0001f600": 1}'))
+    start = details.tokenStarts[1]
+    assert details.text.encode("utf-16-le")[2 * start : 2 * start + 2] == b"1\x00"
+
+
+def test_message_details_pane(qtbot):
+
+    body = json.dumps([{"seq": i, "data": "x" * 100} for i in range(2000)])
+    assert len(body) > 200 * 1024
+
+    pane = MessageDetailsPane(lambda message: message)
+    qtbot.addWidget(pane)
+    assert pane._bodyView.lineWrapMode() == QPlainTextEdit.NoWrap
+
+    # Only the last selected message is shown
+    pane.showMessage(make_message("first"))
+    pane.showMessage(make_message(body))
+
+    qtbot.waitUntil(lambda: pane.details() is not None)
+    details = pane.details()
+    assert details.syntax == Syntax.json
+
+    qtbot.waitUntil(lambda: not pane.isRendering())
+    assert pane._bodyView.toPlainText() == details.text
+
+    # Body is rendered chunk by chunk
+    pane._showDetails(details)
+    assert pane.isRendering()
+    assert pane._bodyView.document().characterCount() == RENDER_CHUNK_SIZE + 1
+    qtbot.waitUntil(lambda: not pane.isRendering())
+    assert pane._bodyView.toPlainText() == details.text
+
+    pane.clear()
+    assert pane._bodyView.toPlainText() == ""
+
+
+def test_messages_pane_details(qtbot, app_data_dir):
+
+    storage = MessageDiskStorage("test-queue")
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message('{"full": "' + "y" * 1000 + '"}')])
+    storage.waitPendingJobsDone()
+
+    pane = MessagesPane(None)
+    qtbot.addWidget(pane)
+    pane.setStorage(storage)
+    for summaries in storage.iterSummaries():
+        pane.addMessages(summaries)
+
+    model = pane._dataModel
+    qtbot.waitUntil(lambda: model.rowCount() == 1)
+
+    # Summary holds a preview only, full message is fetched from storage
+    pane._tableView.selectRow(0)
+    detailsPane = pane._detailsPane
+    qtbot.waitUntil(lambda: detailsPane.details() is not None)
+    assert "y" * 1000 in detailsPane.details().text
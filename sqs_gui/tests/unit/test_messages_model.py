@@ -0,0 +1,191 @@
+from threading import Thread
+import struct
+
+from PyQt5.QtCore import QModelIndex, QPersistentModelIndex, Qt
+
+from sqs_gui.app.components.messages_pane import (
+    Columns,
+    MessagesBridge,
+    MessagesModel,
+    MessagesPane,
+    MessagesSearch,
+)
+from sqs_gui.app.receiver import Message
+from sqs_gui.app.storage import MessageSummary
+
+
+def make_message(i: int) -> Message:
+    return Message(
+        id=f"id-{i}",
+        body=f"body-{i}-" + "x" * 300,
+        md5OfBody="md5",
+        sysAttributes={"SentTimestamp": str(1600000000000 + i)},
+        receiptHandle=f"handle-{i}",
+    )
+
+
+def test_messages_model(qtmodeltester, qtbot):
+
+    model = MessagesModel()
+    summary = MessageSummary("id-0", 1600000000000, "preview-0", ("records", 1, 8))
+
+    with qtbot.waitSignal(model.rowsInserted) as blocker:
+        model.appendMessages([summary])
+    assert blocker.args[1:] == [0, 0]
+
+    with qtbot.waitSignal(model.rowsInserted) as blocker:
+        model.appendMessages([make_message(i) for i in range(1, 100)])
+    assert blocker.args[1:] == [1, 99]
+
+    assert model.rowCount() == 100
+    assert model.data(model.index(0, Columns.messageBody)) == "preview-0"
+    assert model.data(model.index(5, Columns.sendTimestamp)) == "1600000000005"
+    assert model.data(model.index(5, Columns.messageBody)).startswith("body-5-x")
+    assert len(model.data(model.index(5, Columns.messageBody))) == 256
+    assert model.message(5).id == "id-5"
+    assert model.rowCount(model.index(5, 0)) == 0
+    qtmodeltester.check(model)
+
+    model.clear()
+    assert model.rowCount(QModelIndex()) == 0
+
+
+def test_messages_bridge(qtbot):
+
+    model = MessagesModel()
+    bridge = MessagesBridge(interval=100)
+    bridge.delivered.connect(model.appendMessages)
+
+    insertions = []
+    model.rowsInserted.connect(lambda parent, first, last: insertions.append(last))
+
+    def receive():
+        for i in range(0, 1000, 10):
+            bridge.post([make_message(j) for j in range(i, i + 10)])
+
+    thread = Thread(target=receive)
+    thread.start()
+    thread.join()
+
+    qtbot.waitUntil(lambda: model.rowCount() == 1000)
+    assert len(insertions) < 10
+    assert [model.message(row).id for row in (0, 999)] == ["id-0", "id-999"]
+
+
+def test_messages_model_sort(qtmodeltester, qtbot):
+
+    model = MessagesModel()
+    model.appendMessages([make_message(i) for i in (5, 1, 3)])
+    assert [model.timestamp(row) % 1000 for row in range(3)] == [1, 3, 5]
+
+    # Latest messages are inserted at the top in descending order
+    model.sort(Columns.sendDate, Qt.DescendingOrder)
+    with qtbot.waitSignal(model.rowsInserted) as blocker:
+        model.appendMessages([make_message(i) for i in (7, 6)])
+    assert blocker.args[1:] == [0, 1]
+    assert [model.timestamp(row) % 1000 for row in range(5)] == [7, 6, 5, 3, 1]
+
+    # Persistent index follows its message when rows are moved into place
+    selected = QPersistentModelIndex(model.index(2, Columns.messageBody))
+    with qtbot.waitSignal(model.layoutChanged):
+        model.appendMessages([make_message(i) for i in (4, 0, 2)])
+    assert [model.timestamp(row) % 1000 for row in range(8)] == [7, 6, 5, 4, 3, 2, 1, 0]
+    assert model.message(selected.row()).id == "id-5"
+
+    model.sort(Columns.messageBody, Qt.AscendingOrder)
+    bodies = [model.data(model.index(row, Columns.messageBody)) for row in range(8)]
+    assert bodies == sorted(bodies)
+    assert model.message(selected.row()).id == "id-5"
+
+    model.appendMessages([make_message(i) for i in (10, 8)])
+    bodies = [model.data(model.index(row, Columns.messageBody)) for row in range(10)]
+    assert bodies == sorted(bodies)
+    qtmodeltester.check(model)
+
+
+def test_messages_model_filter(qtmodeltester):
+
+    model = MessagesModel()
+    model.appendMessages([make_message(i) for i in range(10)])
+    model.sort(Columns.sendDate, Qt.DescendingOrder)
+
+    model.startFilter()
+    assert model.rowCount() == 0
+
+    model.addMatches([2, 7])
+    model.addMatches([5])
+    assert [model.message(row).id for row in range(3)] == ["id-7", "id-5", "id-2"]
+
+    # New messages are hidden until matched
+    rows = model.appendMessages([make_message(10)])
+    assert model.rowCount() == 3
+    model.addMatches(rows)
+    assert model.message(0).id == "id-10"
+
+    model.sort(Columns.sendDate, Qt.AscendingOrder)
+    assert [model.message(row).id for row in range(4)] == [
+        "id-2",
+        "id-5",
+        "id-7",
+        "id-10",
+    ]
+    qtmodeltester.check(model)
+
+    model.clearFilter()
+    assert model.rowCount() == 11
+
+
+def test_messages_search(qtbot):
+
+    messages = [make_message(i) for i in range(100)]
+    search = MessagesSearch(lambda message: message.body, chunkSize=10)
+
+    found = []
+    search.matched.connect(found.extend)
+
+    # Stale search is cancelled and its matches are dropped
+    search.search("body-1", range(100), messages)
+    search.search("BODY-5", range(100), messages)
+    search.extend(range(100, 101), messages + [make_message(500)])
+
+    qtbot.waitUntil(lambda: len(found) == 12)
+    assert sorted(found) == [5] + list(range(50, 60)) + [100]
+
+
+def test_messages_search_skips_damaged_rows(qtbot):
+
+    messages = [make_message(i) for i in range(20)]
+
+    def readBody(message: Message) -> str:
+        if message.id == "id-3":
+            raise struct.error("unpack_from requires a buffer of at least 32 bytes")
+        return message.body
+
+    search = MessagesSearch(readBody, chunkSize=10)
+    found = []
+    search.matched.connect(found.extend)
+
+    search.search("BODY-", range(20), messages)
+    qtbot.waitUntil(lambda: len(found) == 19)
+    assert 3 not in found
+
+
+def test_messages_pane_search(qtbot):
+
+    pane = MessagesPane(None, searchDelay=10)
+    qtbot.addWidget(pane)
+
+    message = make_message(1000)
+    message.body += "needle"
+    pane.addMessages([make_message(i) for i in range(200)] + [message])
+
+    model = pane._dataModel
+    qtbot.waitUntil(lambda: model.rowCount() == 201)
+
+    # Matches past body preview are found
+    pane._searchField.setText("NEEDLE")
+    qtbot.waitUntil(lambda: model.rowCount() == 1)
+    assert model.message(0).id == "id-1000"
+
+    pane._searchField.setText("")
+    qtbot.waitUntil(lambda: model.rowCount() == 201)
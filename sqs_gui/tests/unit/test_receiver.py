@@ -0,0 +1,273 @@
+import asyncio
+from threading import Lock
+from time import monotonic, sleep
+
+import pytest
+
+from sqs_gui.app import receiver
+from sqs_gui.app.clients import get_max_pool_connections
+from sqs_gui.app.scheduler import ReceiveScheduler
+from sqs_gui.app.receiver import (
+    AdaptivePoller,
+    BufferLimits,
+    Credentials,
+    PollingMode,
+    PollingOptions,
+    ReceiveConditions,
+    ReceiveEngine,
+)
+
+
+def test_adaptive_poller_switches_to_long_polling():
+
+    poller = AdaptivePoller(PollingOptions(max_wait_time=20))
+    assert poller.wait_time(time_left=60) == 0
+
+    poller.update(num_received=0)
+    assert poller.wait_time(time_left=60) == 20
+    assert poller.wait_time(time_left=5.5) == 5
+
+    poller.update(num_received=10)
+    poller.update(num_received=10)
+    assert poller.wait_time(time_left=60) == 0
+
+
+def test_adaptive_poller_tolerates_empty_responses():
+
+    options = PollingOptions(mode=PollingMode.short, empty_receives_tolerance=2)
+    poller = AdaptivePoller(options)
+
+    poller.update(num_received=0)
+    assert not poller.exhausted
+
+    poller.update(num_received=1)
+    poller.update(num_received=0)
+    assert not poller.exhausted
+
+    poller.update(num_received=0)
+    assert poller.exhausted
+    assert poller.wait_time(time_left=60) == 0
+
+    # Empty long polling response means queue is drained
+    poller = AdaptivePoller(options)
+    poller.update(num_received=0, wait_time=20)
+    assert poller.exhausted
+
+
+class FakeSQSClient:
+    """Serves pre-generated messages, each of them only once"""
+
+    def __init__(self, num_messages: int):
+        self._messages = [self._make_message(i) for i in range(num_messages)]
+        self._lock = Lock()
+
+    @staticmethod
+    def _make_message(i: int):
+        return {
+            "MessageId": f"id-{i}",
+            "Body": f"body-{i}",
+            "MD5OfBody": "",
+            "Attributes": {"SentTimestamp": str(1600000000000 + i)},
+            "ReceiptHandle": f"handle-{i}",
+        }
+
+    def get_queue_url(self, QueueName: str):
+        return {"QueueUrl": f"http://localhost/{QueueName}"}
+
+    def receive_message(self, MaxNumberOfMessages: int, **kwargs):
+        with self._lock:
+            batch = self._messages[:MaxNumberOfMessages]
+            del self._messages[:MaxNumberOfMessages]
+        return {"Messages": batch} if batch else {}
+
+
+def receive(monkeypatch, num_messages: int, **kwargs):
+
+    client = FakeSQSClient(num_messages)
+    monkeypatch.setattr(receiver, "get_client", lambda _: client)
+
+    credentials = Credentials("1", "1", "us-east-1", None)
+    conditions = kwargs.pop("conditions", ReceiveConditions(True, 0, 10))
+    polling = PollingOptions(mode=PollingMode.short, empty_receives_tolerance=1)
+    return receiver.receiveMessages(
+        "test", credentials, conditions, polling=polling, **kwargs
+    )
+
+
+@pytest.mark.parametrize("engine", list(ReceiveEngine))
+def test_receive_all_messages(monkeypatch, engine):
+
+    msg_ids_exclude = {"id-0"}
+    messages = list(
+        receive(
+            monkeypatch,
+            95,
+            num_workers=4,
+            msg_ids_exclude=msg_ids_exclude,
+            engine=engine,
+        )
+    )
+    assert sorted(msg.id for msg in messages) == sorted(f"id-{i}" for i in range(1, 95))
+
+
+def test_receive_count_ignores_excluded_messages(monkeypatch):
+
+    conditions = ReceiveConditions(all=False, count=15, timeout=10)
+    msg_ids_exclude = {f"id-{i}" for i in range(10)}
+    messages = list(
+        receive(
+            monkeypatch,
+            100,
+            num_workers=1,
+            msg_ids_exclude=msg_ids_exclude,
+            conditions=conditions,
+        )
+    )
+    assert [msg.id for msg in messages] == [f"id-{i}" for i in range(10, 30)]
+
+
+def test_receive_message_batches(monkeypatch):
+
+    iterator = receive(monkeypatch, 95, num_workers=2)
+    batches = list(iterator.iter_batches(max_size=20, max_latency=5))
+
+    assert all(0 < len(batch) <= 20 for batch in batches)
+    assert sum(map(len, batches)) == 95
+
+
+@pytest.mark.parametrize("engine", list(ReceiveEngine))
+def test_receive_pauses_when_buffer_is_full(monkeypatch, engine):
+
+    limits = BufferLimits(max_messages=25)
+    iterator = receive(
+        monkeypatch, 200, num_workers=4, buffer_limits=limits, engine=engine
+    )
+    buffer = iterator._unique_messages
+
+    messages = [next(iter(iterator))]
+    sleep(0.2)
+
+    # Each worker may add one batch on top of the limit
+    assert buffer._num_messages <= 25 + 4 * 10
+    messages.extend(iterator)
+    assert len(messages) == 200
+
+
+def test_receive_finishes_without_polling_delay(monkeypatch):
+
+    start = monotonic()
+    assert list(receive(monkeypatch, 0, num_workers=4)) == []
+    assert monotonic() - start < 0.25
+
+
+@pytest.mark.parametrize("engine", list(ReceiveEngine))
+def test_receive_with_scheduler(monkeypatch, engine):
+
+    scheduler = ReceiveScheduler(budget=2)
+    iterator = receive(monkeypatch, 50, scheduler=scheduler, engine=engine)
+
+    assert len(list(iterator)) == 50
+    assert scheduler._total_in_flight == 0
+    assert not scheduler._priorities
+
+
+def test_receive_stops_after_empty_long_poll(monkeypatch):
+
+    client = FakeSQSClient(25)
+    wait_times = []
+    receive_message = client.receive_message
+
+    def record_wait_time(**kwargs):
+        wait_times.append(kwargs["WaitTimeSeconds"])
+        return receive_message(**kwargs)
+
+    monkeypatch.setattr(client, "receive_message", record_wait_time)
+    monkeypatch.setattr(receiver, "get_client", lambda _: client)
+
+    credentials = Credentials("1", "1", "us-east-1", None)
+    conditions = ReceiveConditions(True, 0, 60)
+    iterator = receiver.receiveMessages("test", credentials, conditions, num_workers=1)
+
+    assert len(list(iterator)) == 25
+    assert wait_times == [0, 0, 0, 0, 20]
+
+
+@pytest.mark.parametrize("engine", list(ReceiveEngine))
+def test_receive_workers_fit_client_pool(monkeypatch, engine):
+
+    # Fallback of asyncio engine sends requests with the shared client
+    monkeypatch.setattr(receiver, "get_aio_session", None)
+    iterator = receive(monkeypatch, 50, num_workers=1000, engine=engine)
+    assert iterator._num_workers <= get_max_pool_connections()
+    assert len(list(iterator)) == 50
+
+
+def test_message_buffer_counts_utf8_bytes():
+
+    buffer = receiver.MessageBuffer(BufferLimits(max_bytes=100))
+    message = receiver.Message(
+        id="id-0",
+        body="ä" * 40,
+        md5OfBody="",
+        attributes={"blob": {"DataType": "Binary", "BinaryValue": b"x" * 16}},
+    )
+
+    buffer.put([message])
+    assert buffer._num_bytes == 80 + 4 + 16
+    assert not buffer.has_space()
+
+    assert buffer.get() == [message]
+    assert buffer._num_bytes == 0
+
+
+def test_async_receive_raises_worker_errors(monkeypatch, caplog):
+
+    monkeypatch.setattr(receiver, "get_aio_session", None)
+    iterator = receive(monkeypatch, 0, num_workers=4, engine=ReceiveEngine.asyncio)
+
+    def deny(**kwargs):
+        raise PermissionError("AccessDenied")
+
+    monkeypatch.setattr(iterator._client, "receive_message", deny)
+
+    # Failed requests must not look like an empty queue
+    with pytest.raises(PermissionError):
+        asyncio.run(iterator.receive_all())
+    assert "Receive worker failed" in caplog.text
+
+
+def test_receive_stop_wakes_workers_waiting_for_slots(monkeypatch):
+
+    client = FakeSQSClient(100)
+    num_requests = []
+    receive_message = client.receive_message
+
+    def count_requests(**kwargs):
+        num_requests.append(1)
+        return receive_message(**kwargs)
+
+    monkeypatch.setattr(client, "receive_message", count_requests)
+    monkeypatch.setattr(receiver, "get_client", lambda _: client)
+
+    # Other receive holds all slots, workers wait for them
+    scheduler = ReceiveScheduler(budget=4)
+    other = scheduler.register()
+    for _ in range(4):
+        scheduler.acquire(other)
+
+    credentials = Credentials("1", "1", "us-east-1", None)
+    conditions = ReceiveConditions(all=True, count=0, timeout=10)
+    iterator = receiver.receiveMessages(
+        "test", credentials, conditions, num_workers=4, scheduler=scheduler
+    )
+
+    iterator.start_message_receiving()
+    sleep(0.1)
+    start = monotonic()
+    iterator._stop_workers()
+    for _ in range(4):
+        scheduler.release(other)
+
+    assert list(iterator) == []
+    assert monotonic() - start < 1
+    assert not num_requests
@@ -0,0 +1,88 @@
+from threading import Thread
+from time import sleep
+
+from sqs_gui.app.scheduler import ReceiveScheduler
+
+
+def test_scheduler_respects_budget():
+
+    scheduler = ReceiveScheduler(budget=2)
+    first = scheduler.register()
+    second = scheduler.register()
+
+    assert scheduler.acquire(first, timeout=0)
+    assert scheduler.acquire(second, timeout=0)
+    assert not scheduler.acquire(first, timeout=0.01)
+
+    scheduler.release(second)
+    assert scheduler.acquire(first, timeout=0)
+
+
+def test_scheduler_gives_slot_to_receive_behind_its_share():
+
+    scheduler = ReceiveScheduler(budget=3)
+    other = scheduler.register()
+    low = scheduler.register(priority=1)
+    high = scheduler.register(priority=3)
+
+    for receive_id in (other, low, high):
+        assert scheduler.acquire(receive_id, timeout=0)
+
+    results = dict()
+
+    def acquire(receive_id: int):
+        results[receive_id] = scheduler.acquire(receive_id, timeout=0.5)
+
+    threads = [Thread(target=acquire, args=(i,)) for i in (low, high)]
+    for thread in threads:
+        thread.start()
+
+    # Both have one request in flight, but `high` has higher priority
+    sleep(0.1)
+    scheduler.release(other)
+    for thread in threads:
+        thread.join()
+
+    assert results == {low: False, high: True}
+
+
+def test_scheduler_cancel_wakes_waiters():
+
+    scheduler = ReceiveScheduler(budget=1)
+    other = scheduler.register()
+    cancelled = scheduler.register()
+    assert scheduler.acquire(other, timeout=0)
+
+    results = []
+    thread = Thread(target=lambda: results.append(scheduler.acquire(cancelled, 5)))
+    thread.start()
+
+    sleep(0.1)
+    scheduler.cancel(cancelled)
+    thread.join(timeout=1)
+    assert results == [False]
+
+    scheduler.release(other)
+    assert not scheduler.acquire(cancelled, timeout=0)
+    assert scheduler._total_in_flight == 0
+
+
+def test_scheduler_counts_non_blocking_waiters():
+
+    scheduler = ReceiveScheduler(budget=2)
+    other = scheduler.register()
+    busy = scheduler.register()
+    waiting = scheduler.register()
+    assert scheduler.acquire(other, timeout=0)
+    assert scheduler.acquire(busy, timeout=0)
+
+    notified = []
+    scheduler.add_listener(lambda: notified.append(True))
+    scheduler.begin_wait(waiting)
+
+    # Free slot goes to receive with nothing in flight, which polls for it
+    scheduler.release(other)
+    assert notified
+    assert not scheduler.acquire(busy, timeout=0)
+    assert scheduler.acquire(waiting, timeout=0)
+    scheduler.end_wait(waiting)
@@ -0,0 +1,423 @@
+from time import time
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sqs_gui.app.id_index import MessageIdIndex
+from sqs_gui.app import records
+from sqs_gui.app.receiver import Message
+from sqs_gui.app.segments import SegmentLog
+from sqs_gui.app.sqlite_storage import SqliteMessageStorage
+from sqs_gui.app.storage import (
+    Checkpoint,
+    Compression,
+    Durability,
+    MessageDiskStorage,
+    StorageLockedError,
+)
+from sqs_gui.app.storage_manager import StorageLimits, StorageManager
+
+
+def make_message(i: int) -> Message:
+    return Message(
+        id=f"id-{i}",
+        body=f"body-{i}-ü",
+        md5OfBody="md5",
+        attributes={
+            "text": {"DataType": "String", "StringValue": "value"},
+            "data": {"DataType": "Binary", "BinaryValue": b"binary"},
+        },
+        md5OfAttributes="md5",
+        sysAttributes={"SentTimestamp": str(1600000000000 + i)},
+        receiptHandle=f"handle-{i}",
+    )
+
+
+@pytest.fixture
+def storage(app_data_dir):
+    return MessageDiskStorage("test-queue")
+
+
+def test_storage_save_load(storage):
+
+    # Message saved by older version as a JSON file
+    legacy = make_message(0)
+    with open(os.path.join(storage._workdir, legacy.id), "w") as f:
+        f.write(storage.serialize(legacy))
+    assert legacy == make_message(0)
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(1, 100)])
+    storage.saveMessage(make_message(100))
+    storage.waitPendingJobsDone()
+
+    loaded = sorted(
+        storage.loadMessages(), key=lambda msg: msg.sysAttributes["SentTimestamp"]
+    )
+    assert [msg.id for msg in loaded] == [f"id-{i}" for i in range(101)]
+    for i in (0, 5, 100):
+        assert loaded[i] == make_message(i)
+
+
+def test_record_encoding():
+
+    message = make_message(1)
+    message.attributes["list"] = {
+        "DataType": "String",
+        "StringListValues": ["a", "b"],
+    }
+
+    decoded = records.decodeRecord(records.encodeRecord(message))
+    assert decoded == message
+    assert decoded.attributes["data"]["BinaryValue"] == b"binary"
+
+    message = make_message(2)
+    message.attributes = None
+    message.md5OfAttributes = None
+    assert records.decodeRecord(records.encodeRecord(message)) == message
+
+    record = records.encodeRecord(message)
+    assert record[0] == records.RECORD_V2
+    assert records.decodeRecordId(record) == "id-2"
+
+    # Record of version 1, no longer supported
+    with pytest.raises(ValueError):
+        records.decodeRecord(b"\x01" + record[1:])
+
+
+def test_storage_iter_summaries(storage):
+
+    legacy = make_message(0)
+    with open(os.path.join(storage._workdir, legacy.id), "w") as f:
+        f.write(storage.serialize(legacy))
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(1, 25)])
+    storage.waitPendingJobsDone()
+
+    batches = list(storage.iterSummaries(batchSize=10, previewLength=7))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+    summaries = {summary.id: summary for batch in batches for summary in batch}
+    assert summaries["id-12"].sentTimestamp == 1600000000012
+    assert summaries["id-12"].preview == "body-12"
+    assert summaries["id-0"].preview == "body-0-"
+
+    for messageId in ("id-0", "id-12"):
+        message = storage.fetchMessage(summaries[messageId])
+        assert message.id == messageId
+        assert message.attributes["text"]["StringValue"] == "value"
+
+    body = storage.readBody(summaries["id-12"])
+    assert isinstance(body, memoryview)
+    assert str(body, "utf-8") == "body-12-ü"
+    assert bytes(storage.readBody(summaries["id-0"])) == "body-0-ü".encode()
+
+
+@pytest.mark.parametrize("compression", [Compression.zlib, Compression.lzma])
+def test_storage_compression(app_data_dir, compression):
+
+    storage = MessageDiskStorage(
+        "test-queue",
+        compression=compression,
+        maxBlockSize=1024,
+    )
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(100)])
+    storage.waitPendingJobsDone()
+
+    assert len(storage._blockLog.segmentIds()) == 1
+    assert not storage._log.segmentIds()
+
+    loaded = storage.loadMessages()
+    assert [msg.id for msg in loaded] == [f"id-{i}" for i in range(100)]
+    assert loaded[42].attributes["text"]["StringValue"] == "value"
+
+    summaries = [summary for batch in storage.iterSummaries() for summary in batch]
+    assert len({summary.location[:3] for summary in summaries}) > 1
+    assert storage.fetchMessage(summaries[77]).receiptHandle == "handle-77"
+    assert str(storage.readBody(summaries[3]), "utf-8") == "body-3-ü"
+
+
+def test_storage_parallel_load(storage):
+
+    legacy = make_message(0)
+    with open(os.path.join(storage._workdir, legacy.id), "w") as f:
+        f.write(storage.serialize(legacy))
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in reversed(range(1, 50))])
+    storage.waitPendingJobsDone()
+
+    # Same queue, later written with compression
+    compressed = MessageDiskStorage("test-queue", compression=Compression.zlib)
+    compressed.startReceivingJobs()
+    compressed.saveMessages([make_message(i) for i in range(50, 80)])
+    compressed.waitPendingJobsDone()
+
+    expected = [f"id-{i}" for i in range(80)]
+    for numWorkers in (1, 2):
+        loaded = compressed.loadMessages(numWorkers=numWorkers, chunkSize=10)
+        assert [msg.id for msg in loaded] == expected
+
+    assert loaded[70].attributes["text"]["StringValue"] == "value"
+
+
+
+def test_storage_workers_skip_gui():
+
+    # Spawned workers import storage modules, GUI and AWS clients stay out
+    code = (
+        "import sys, sqs_gui.app.storage; "
+        "sys.exit(any(m in sys.modules for m in ('PyQt5.QtWidgets', 'boto3')))"
+    )
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_storage_group_commit(app_data_dir):
+
+    storage = MessageDiskStorage(
+        "test-queue",
+        durability=Durability.fsync,
+        maxGroupSize=100,
+        maxGroupDelay=1,
+    )
+
+    # Batches queued before the thread starts are coalesced
+    for i in range(100):
+        storage.saveMessage(make_message(i))
+    storage.saveMessages([make_message(i) for i in range(100, 150)])
+    storage.startReceivingJobs()
+    storage.waitPendingJobsDone()
+
+    stats = storage.writeStats
+    assert stats.messages == 150
+    assert stats.commits == 2
+    assert stats.bytes > 0
+    assert len(storage.loadMessages()) == 150
+
+
+@pytest.mark.parametrize("compression", [Compression.none, Compression.zlib])
+def test_storage_checkpoint(storage, compression):
+
+    storage._compression = compression
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(10)])
+    storage.waitPendingJobsDone()
+
+    assert storage.loadCheckpoint() is None
+    checkpoint = Checkpoint(MessageIdIndex(f"id-{i}" for i in range(10)))
+    checkpoint.lastDumpTime = 1600000000.5
+    checkpoint.numDumps = 1
+    checkpoint.numReceived = 10
+    storage.saveCheckpoint(checkpoint)
+
+    # Messages written after checkpoint, e.g. before a crash
+    storage = MessageDiskStorage("test-queue", compression=compression)
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(10, 15)])
+    storage.waitPendingJobsDone()
+
+    loaded = storage.loadCheckpoint()
+    assert loaded.lastDumpTime == 1600000000.5
+    assert (loaded.numDumps, loaded.numReceived) == (1, 10)
+    assert len(loaded.messageIds) == 15
+    assert "id-14" in loaded.messageIds
+
+    # Checkpoint no longer matches truncated data
+    log = storage._log if compression == Compression.none else storage._blockLog
+    with open(log.segmentPath(log.segmentIds()[-1]), "r+b") as f:
+        f.truncate(32)
+    assert storage.loadCheckpoint() is None
+
+    # Checkpoint cut short, e.g. by a crash while saving
+    storage.saveCheckpoint(checkpoint)
+    filepath = os.path.join(storage._workdir, "checkpoint.bin")
+    with open(filepath, "r+b") as f:
+        f.truncate(os.path.getsize(filepath) - 8)
+    assert storage.loadCheckpoint() is None
+
+
+def test_storage_single_writer(storage):
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(10)])
+
+    # Second writer would cut records the first one is appending
+    other = MessageDiskStorage("test-queue")
+    with pytest.raises(StorageLockedError):
+        other.startReceivingJobs()
+    assert len(other.loadMessages()) <= 10
+
+    storage.waitPendingJobsDone()
+    other = MessageDiskStorage("test-queue")
+    other.startReceivingJobs()
+    other.saveMessages([make_message(i) for i in range(10, 20)])
+    other.waitPendingJobsDone()
+    assert len(other.loadMessages()) == 20
+
+
+def test_storage_write_failure(storage):
+
+    def failingWrite(messages):
+        raise OSError("No space left on device")
+
+    storage._writeMessages = failingWrite
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(10)])
+    storage.waitPendingJobsDone()
+
+    # Checkpoint would mark messages which are not stored as seen
+    assert storage.failed
+    with pytest.raises(OSError):
+        storage.saveCheckpoint(Checkpoint(MessageIdIndex(["id-0"])))
+    assert storage.loadCheckpoint() is None
+
+
+def test_segment_log_drops_torn_record(tmp_path):
+
+    log = SegmentLog(str(tmp_path), maxSegmentSize=64)
+    for i in range(10):
+        log.append(f"record-{i}".encode())
+    log.close()
+
+    assert len(log.segmentIds()) > 1
+    lastSegment = log.segmentPath(log.segmentIds()[-1])
+    with open(lastSegment, "ab") as f:
+        f.write(b"\xff\x00\x00\x00torn")
+
+    log.append(b"record-10")
+    log.close()
+
+    records = [bytes(record) for record in log.iterRecords()]
+    assert records == [f"record-{i}".encode() for i in range(11)]
+
+    for segmentId in log.segmentIds():
+        for offset in log.readOffsets(segmentId):
+            assert bytes(log.readRecord(segmentId, offset)).startswith(b"record-")
+
+
+def test_sqlite_storage_query(app_data_dir):
+
+    storage = SqliteMessageStorage("test-queue")
+
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in reversed(range(50))])
+    storage.saveMessage(make_message(0))
+    storage.waitPendingJobsDone()
+
+    rows = [SqliteMessageStorage._toRow(make_message(i)) for i in range(50)]
+    rows.append(SqliteMessageStorage._toRow(make_message(0)))
+    numChars = sum(len(row[i]) for row in rows for i in (3, 4, 6))
+    # Each body has a two-byte "ü"
+    assert storage.writeStats.bytes == numChars + len(rows)
+    assert storage.countMessages() == 50
+    assert [msg.id for msg in storage.queryPage(10, 2)] == ["id-10", "id-11"]
+    assert storage.loadMessage("id-7").attributes["text"]["StringValue"] == "value"
+    assert [msg.id for msg in storage.searchMessages("body-42")] == ["id-42"]
+
+    storage.saveCheckpoint(Checkpoint(MessageIdIndex(["id-0"])))
+    storage = SqliteMessageStorage("test-queue")
+    storage.startReceivingJobs()
+    storage.saveMessage(make_message(50))
+    storage.waitPendingJobsDone()
+    assert len(storage.loadCheckpoint().messageIds) == 2
+
+    (summaries,) = storage.iterSummaries(batchSize=100, previewLength=6)
+    assert [summary.preview for summary in summaries[:2]] == ["body-0", "body-1"]
+    assert storage.fetchMessage(summaries[3]).body == "body-3-ü"
+
+
+def test_storage_manager_limits(dump_queue):
+
+    messages = [make_message(i) for i in range(50)]
+    now = time()
+    old = dump_queue("old-queue", messages, now - 3600)
+    recent = dump_queue("recent-queue", messages, now)
+    expired = dump_queue("expired-queue", messages, now - 7 * 24 * 3600)
+
+    manager = StorageManager(StorageLimits(None, None, maxAge=24 * 3600))
+    assert manager.enforce()
+    assert not os.path.exists(expired._workdir)
+
+    sizes = manager.queueSizes()
+    queueSize = sizes["recent-queue"]
+    assert sizes == {"old-queue": queueSize, "recent-queue": queueSize}
+
+    # Oldest segments of least recently used queue go first
+    limits = StorageLimits(queueSize, queueSize + queueSize // 2, None)
+    removed = StorageManager(limits).enforce()
+    assert old._log.segmentPath(1) in removed
+    assert recent._log.segmentPath(1) not in removed
+    assert old.loadCheckpoint() is None
+    assert recent.loadCheckpoint() is not None
+
+    loaded = [msg.id for msg in old.loadMessages()]
+    assert loaded and "id-0" not in loaded
+    assert len(recent.loadMessages()) == 50
+
+    # Queues being dumped are left untouched
+    StorageManager(StorageLimits(0, 0, None)).enforce(exclude=["recent-queue"])
+    assert not os.path.exists(old._workdir)
+    assert len(recent.loadMessages()) == 50
+
+
+def test_storage_manager_open_queues(monkeypatch, dump_queue):
+
+    messages = [make_message(i) for i in range(50)]
+    storages = {
+        queueName: dump_queue(queueName, messages)
+        for queueName in ("open-queue", "locked-queue")
+    }
+
+    manager = StorageManager(StorageLimits(0, 0, None))
+    manager.openQueue("open-queue")
+    manager.openQueue("open-queue")
+    manager.closeQueue("open-queue")
+
+    # Mapped segment can't be removed on Windows
+    locked = storages["locked-queue"]
+    lockedPath = locked._log.segmentPath(1)
+    remove = os.remove
+
+    def removeUnlocked(path):
+        if path == lockedPath:
+            raise PermissionError(f"File is in use: {path}")
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", removeUnlocked)
+    removed = manager.enforce()
+
+    assert len(storages["open-queue"].loadMessages()) == 50
+    assert storages["open-queue"].loadCheckpoint() is not None
+    assert lockedPath not in removed and os.path.exists(lockedPath)
+    assert locked._log.segmentPath(2) in removed
+    assert locked.loadCheckpoint() is None
+
+    manager.closeQueue("open-queue")
+    manager.enforce()
+    assert not os.path.exists(storages["open-queue"]._workdir)
+
+
+def test_storage_manager_vanished_files(monkeypatch, app_data_dir):
+
+
+    storage = MessageDiskStorage("test-queue")
+    storage.startReceivingJobs()
+    storage.saveMessages([make_message(i) for i in range(10)])
+    storage.waitPendingJobsDone()
+
+    # Segment is removed by a storage while queue is scanned
+    vanished = {storage._log.segmentPath(1), storage._log.offsetsPath(1)}
+    getmtime = os.path.getmtime
+
+    def getmtimeVanished(path):
+        if path in vanished:
+            raise FileNotFoundError(path)
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, "getmtime", getmtimeVanished)
+    assert StorageManager().queueSizes() == {"test-queue": 0}